@@ -0,0 +1,12 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def synchronous_background_tasks(settings):
+    """Фоновые задачи под тестами выполняются сразу.
+
+    Иначе потоки миниатюр писали бы во временные MEDIA_ROOT, которые
+    тесты уже удалили.
+    """
+    settings.THUMBNAIL_ASYNC = False
+    settings.TIMELINE_ASYNC = False
@@ -0,0 +1,358 @@
+"""Бэкенды общего кеша.
+
+SQLiteCache хранит кеш в файле SQLite, общем для всех процессов
+на машине; с адресом по умолчанию (:memory:) кеш живёт в памяти процесса
+и служит заменой общего кеша в тестах и разработке.
+RedisCache — сетевой кеш с пулом соединений; требует пакет redis.
+"""
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.exceptions import ImproperlyConfigured
+
+from . import metrics
+
+
+def _dumps(value):
+    # Целые числа хранятся как есть, чтобы incr выполнялся на стороне
+    # хранилища без распаковки.
+    if isinstance(value, int) and not isinstance(value, bool):
+        return str(value).encode()
+    return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+
+def _loads(data):
+    try:
+        return int(data)
+    except (TypeError, ValueError):
+        return pickle.loads(data)
+
+
+def _count_reads(requested, found):
+    # Попадания и промахи чтений попадают в замеры запроса
+    metrics.count('cache_hits', found)
+    metrics.count('cache_misses', requested - found)
+
+
+# Соединения SQLite общие для всех потоков процесса: по одному на файл
+_connections = {}
+_connections_lock = threading.Lock()
+
+
+def _shared_connection(location):
+    with _connections_lock:
+        if location not in _connections:
+            connection = sqlite3.connect(
+                location,
+                timeout=30,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)'
+            )
+            _connections[location] = (connection, threading.RLock())
+        return _connections[location]
+
+
+class SQLiteCache(BaseCache):
+    """Кеш в таблице SQLite с атомарными add и incr."""
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._connection, self._lock = _shared_connection(
+            location or ':memory:')
+        self._writes = 0
+
+    @contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE сразу берёт блокировку записи, поэтому
+        # чтение и запись внутри транзакции атомарны между процессами.
+        with self._lock:
+            self._connection.execute('BEGIN IMMEDIATE')
+            try:
+                yield self._connection
+            except BaseException:
+                self._connection.execute('ROLLBACK')
+                raise
+            self._connection.execute('COMMIT')
+
+    def _execute(self, sql, params=(), many=False):
+        if many:
+            with self._transaction() as connection:
+                return connection.executemany(sql, params).fetchall()
+        with self._lock:
+            return self._connection.execute(sql, params).fetchall()
+
+    def _expires(self, timeout):
+        # get_backend_timeout возвращает момент истечения
+        return self.get_backend_timeout(timeout)
+
+    def _live(self):
+        return '(expires IS NULL OR expires > ?)'
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with metrics.timed('cache'):
+            rows = self._execute(
+                f'SELECT value FROM cache WHERE key = ? AND {self._live()}',
+                (key, time.time()),
+            )
+        _count_reads(1, len(rows))
+        return _loads(rows[0][0]) if rows else default
+
+    def get_many(self, keys, version=None):
+        made = {self.make_key(key, version=version): key for key in keys}
+        if not made:
+            return {}
+        placeholders = ', '.join('?' * len(made))
+        with metrics.timed('cache'):
+            rows = self._execute(
+                f'SELECT key, value FROM cache '
+                f'WHERE key IN ({placeholders}) AND {self._live()}',
+                (*made, time.time()),
+            )
+        _count_reads(len(made), len(rows))
+        return {made[key]: _loads(value) for key, value in rows}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._cull()
+        self._execute(
+            'INSERT OR REPLACE INTO cache (key, value, expires) '
+            'VALUES (?, ?, ?)',
+            (key, _dumps(value), self._expires(timeout)),
+        )
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self._expires(timeout)
+        self._cull()
+        self._execute(
+            'INSERT OR REPLACE INTO cache (key, value, expires) '
+            'VALUES (?, ?, ?)',
+            [
+                (self.make_key(key, version=version), _dumps(value), expires)
+                for key, value in data.items()
+            ],
+            many=True,
+        )
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+        with self._transaction() as connection:
+            connection.execute(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                (key, now),
+            )
+            cursor = connection.execute(
+                'INSERT OR IGNORE INTO cache (key, value, expires) '
+                'VALUES (?, ?, ?)',
+                (key, _dumps(value), self._expires(timeout)),
+            )
+            return cursor.rowcount == 1
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        with self._lock:
+            cursor = self._connection.execute(
+                f'UPDATE cache SET expires = ? WHERE key = ? '
+                f'AND {self._live()}',
+                (self._expires(timeout), key, time.time()),
+            )
+            return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        with self._transaction() as connection:
+            rows = connection.execute(
+                f'SELECT value FROM cache WHERE key = ? '
+                f'AND {self._live()}',
+                (key, time.time()),
+            ).fetchall()
+            if not rows:
+                raise ValueError(f"Key '{key}' not found")
+            value = _loads(rows[0][0]) + delta
+            connection.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                (_dumps(value), key),
+            )
+        return value
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        return bool(self._execute(
+            f'SELECT 1 FROM cache WHERE key = ? AND {self._live()}',
+            (key, time.time()),
+        ))
+
+    def delete(self, key, version=None):
+        self._execute(
+            'DELETE FROM cache WHERE key = ?',
+            (self.make_key(key, version=version),),
+        )
+
+    def delete_many(self, keys, version=None):
+        self._execute(
+            'DELETE FROM cache WHERE key = ?',
+            [(self.make_key(key, version=version),) for key in keys],
+            many=True,
+        )
+
+    def clear(self):
+        self._execute('DELETE FROM cache')
+
+    # Размер таблицы проверяется раз в CULL_CHECK_EVERY записей
+    CULL_CHECK_EVERY = 100
+
+    def _cull(self):
+        self._writes += 1
+        if self._cull_frequency == 0 or self._writes % self.CULL_CHECK_EVERY:
+            return
+        count = self._execute('SELECT COUNT(*) FROM cache')[0][0]
+        if count < self._max_entries:
+            return
+        self._execute(
+            'DELETE FROM cache WHERE expires <= ?', (time.time(),))
+        self._execute(
+            'DELETE FROM cache WHERE key IN ('
+            'SELECT key FROM cache ORDER BY expires IS NULL, expires LIMIT ?)',
+            (count // self._cull_frequency,),
+        )
+
+    def close(self, **kwargs):
+        # Соединение живёт всё время работы процесса.
+        pass
+
+
+# Скрипт увеличивает значение, только если ключ существует.
+_INCR_SCRIPT = """
+if redis.call('exists', KEYS[1]) == 1 then
+    return redis.call('incrby', KEYS[1], ARGV[1])
+end
+return nil
+"""
+
+
+class RedisCache(BaseCache):
+    """Кеш в Redis с общим пулом соединений на процесс.
+
+    OPTIONS передаются в redis.ConnectionPool.from_url, например
+    {'max_connections': 50, 'socket_timeout': 1}.
+    """
+
+    def __init__(self, server, params):
+        super().__init__(params)
+        try:
+            import redis
+        except ImportError as error:
+            raise ImproperlyConfigured(
+                'Для RedisCache установите пакет redis.'
+            ) from error
+        options = params.get('OPTIONS') or {}
+        self._pool = redis.ConnectionPool.from_url(server, **options)
+        self._client = redis.Redis(connection_pool=self._pool)
+        self._incr = self._client.register_script(_INCR_SCRIPT)
+
+    def _ttl(self, timeout):
+        """Срок жизни в секундах; None — бессрочно, 0 — не хранить."""
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return None
+        return max(int(timeout), 0)
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        with metrics.timed('cache'):
+            data = self._client.get(key)
+        _count_reads(1, data is not None)
+        return default if data is None else _loads(data)
+
+    def get_many(self, keys, version=None):
+        made = {self.make_key(key, version=version): key for key in keys}
+        if not made:
+            return {}
+        with metrics.timed('cache'):
+            values = self._client.mget(list(made))
+        _count_reads(
+            len(made), sum(data is not None for data in values))
+        return {
+            made[key]: _loads(data)
+            for key, data in zip(made, values) if data is not None
+        }
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        ttl = self._ttl(timeout)
+        if ttl == 0:
+            self._client.delete(key)
+            return
+        self._client.set(key, _dumps(value), ex=ttl)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        ttl = self._ttl(timeout)
+        if ttl == 0:
+            self.delete_many(data, version=version)
+            return []
+        pipeline = self._client.pipeline()
+        for key, value in data.items():
+            pipeline.set(
+                self.make_key(key, version=version), _dumps(value), ex=ttl)
+        pipeline.execute()
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        ttl = self._ttl(timeout)
+        if ttl == 0:
+            return False
+        return bool(self._client.set(key, _dumps(value), ex=ttl, nx=True))
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        ttl = self._ttl(timeout)
+        if ttl is None:
+            return bool(self._client.persist(key))
+        if ttl == 0:
+            return bool(self._client.delete(key))
+        return bool(self._client.expire(key, ttl))
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        value = self._incr(keys=[key], args=[delta])
+        if value is None:
+            raise ValueError(f"Key '{key}' not found")
+        return value
+
+    def has_key(self, key, version=None):
+        return bool(self._client.exists(self.make_key(key, version=version)))
+
+    def delete(self, key, version=None):
+        self._client.delete(self.make_key(key, version=version))
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_key(key, version=version) for key in keys]
+        if keys:
+            self._client.delete(*keys)
+
+    def clear(self):
+        # Удаляются только ключи этого сайта, а не вся база Redis.
+        pattern = self.make_key('*', version=None).replace(
+            f':{self.version}:', ':*:', 1)
+        for key in self._client.scan_iter(match=pattern, count=1000):
+            self._client.delete(key)
+
+    def close(self, **kwargs):
+        # Соединения возвращаются в пул и переиспользуются.
+        pass
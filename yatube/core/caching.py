@@ -0,0 +1,250 @@
+"""Кеширование с инвалидацией по счётчикам поколений.
+
+Каждая область данных (лента, группа, автор, пост) имеет счётчик
+поколения. Ключ кеша включает текущие поколения своих областей, поэтому
+запись, увеличившая счётчик, делает устаревшие ключи недостижимыми,
+и их не нужно удалять поштучно.
+"""
+import hashlib
+import math
+import random
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ObjectDoesNotExist
+from django.http import HttpResponse
+from django.utils.http import quote_etag
+from django.views.decorators.http import condition
+
+GENERATION_KEY = 'generation:{digest}'
+
+
+def _generation_key(scope):
+    # Области содержат слаги и имена пользователей, которые могут быть
+    # длинными и не-ASCII, поэтому в ключ попадает их хеш.
+    return GENERATION_KEY.format(
+        digest=hashlib.md5(scope.encode()).hexdigest())
+
+
+def _initial_generation():
+    # Начальное значение от времени: после вытеснения счётчика из кеша
+    # поколение не совпадёт ни с одним из прежних.
+    return int(time.time() * 1000)
+
+
+def get_generations(scopes):
+    """Текущие поколения областей scopes в том же порядке."""
+    keys = [_generation_key(scope) for scope in scopes]
+    found = cache.get_many(keys) if keys else {}
+    generations = []
+    for key in keys:
+        if key not in found:
+            cache.add(key, _initial_generation(), None)
+            found[key] = cache.get(key)
+        generations.append(found[key])
+    return generations
+
+
+def bump_generation(*scopes):
+    """Увеличивает поколения областей, делая их кеш устаревшим."""
+    for scope in scopes:
+        key = _generation_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial_generation(), None)
+
+
+def _digest(*parts):
+    return hashlib.md5(
+        '\x00'.join(str(part) for part in parts).encode()
+    ).hexdigest()
+
+
+def versioned_key(prefix, scopes, *parts):
+    """Ключ кеша, зависящий от поколений scopes и значений parts."""
+    generations = '.'.join(str(gen) for gen in get_generations(scopes))
+    return f'{prefix}:{generations}:{_digest(*parts)}'
+
+
+def acquire_lock(key, timeout=None):
+    """Пытается захватить блокировку пересчёта ключа key."""
+    if timeout is None:
+        timeout = settings.CACHE_LOCK_TIMEOUT
+    return cache.add(f'{key}:lock', 1, timeout)
+
+
+def release_lock(key):
+    cache.delete(f'{key}:lock')
+
+
+def wait_for(key, timeout=None):
+    """Ждёт, пока значение key вычислит владелец блокировки.
+
+    Возвращает None, если значение не появилось за timeout секунд.
+    """
+    if timeout is None:
+        timeout = settings.CACHE_LOCK_TIMEOUT
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        time.sleep(settings.CACHE_LOCK_POLL)
+        value = cache.get(key)
+        if value is not None:
+            return value
+    return None
+
+
+def _is_cacheable(request, response):
+    # CSRF-токен на странице годится только для cookie её посетителя,
+    # такую страницу нельзя отдавать другим.
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not request.META.get('CSRF_COOKIE_USED')
+    )
+
+
+def is_fresh(entry, generations, beta=None):
+    """Можно ли отдать запись кеша без пересчёта.
+
+    Запись устарела, если сменилось поколение её областей или истёк её
+    срок. Срок считается истёкшим чуть раньше с вероятностью, растущей
+    к его концу и пропорциональной времени пересчёта (XFetch), поэтому
+    горячий ключ пересчитывает один запрос до массового промаха.
+    """
+    if beta is None:
+        beta = settings.CACHE_EARLY_EXPIRY_BETA
+    if list(entry['generations']) != list(generations):
+        return False
+    early = entry['delta'] * beta * -math.log(1.0 - random.random())
+    return time.time() + early < entry['expires']
+
+
+def cache_view(scopes, timeout=None, key_prefix='view'):
+    """Кеширует ответ GET-представления вместо cache_page.
+
+    scopes(request, *args, **kwargs) возвращает области страницы; запись
+    помнит их поколения и устаревает, когда они меняются или истекает
+    timeout (по умолчанию CACHING_TIME). Устаревшую запись пересчитывает
+    один запрос, захвативший блокировку, а остальные тем временем
+    получают прежнюю версию (stale-while-revalidate); после полного
+    промаха остальные ждут результат. Ключ учитывает адрес и пользователя;
+    страницы с CSRF-токеном и ответы, устанавливающие cookie,
+    не кешируются.
+    """
+    if timeout is None:
+        timeout = settings.CACHING_TIME
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            generations = _page_generations(scopes, request, args, kwargs)
+            if generations is None:
+                return view(request, *args, **kwargs)
+            key = _view_key(key_prefix, request)
+            entry = cache.get(key)
+            if entry is not None and is_fresh(entry, generations):
+                return _cached_response(entry)
+            if not acquire_lock(key):
+                return _while_locked(
+                    key, entry, generations, view, request, args, kwargs)
+            try:
+                started = time.monotonic()
+                response = view(request, *args, **kwargs)
+                if _is_cacheable(request, response):
+                    _store(key, response, generations, timeout,
+                           time.monotonic() - started)
+            finally:
+                release_lock(key)
+            return response
+        return wrapper
+    return decorator
+
+
+def _request_generations(scopes, request, args, kwargs):
+    # conditional_view и cache_view одной страницы читают поколения
+    # одних и тех же областей, поэтому они считаются раз за запрос.
+    # None — объекта страницы нет.
+    computed = request.__dict__.setdefault('_page_generations', {})
+    if scopes not in computed:
+        try:
+            computed[scopes] = get_generations(
+                scopes(request, *args, **kwargs))
+        except ObjectDoesNotExist:
+            computed[scopes] = None
+    return computed[scopes]
+
+
+def _page_generations(scopes, request, args, kwargs):
+    # Кешируются только GET и HEAD страниц существующих объектов
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    return _request_generations(scopes, request, args, kwargs)
+
+
+def _view_key(key_prefix, request):
+    return f'{key_prefix}:' + _digest(
+        request.get_full_path(), request.user.pk or '')
+
+
+def _while_locked(key, entry, generations, view, request, args, kwargs):
+    # Запись пересчитывает другой запрос: отдаём прежнюю версию,
+    # а если её нет — ждём результат.
+    if entry is None:
+        entry = wait_for(key)
+    if entry is None:
+        return view(request, *args, **kwargs)
+    response = _cached_response(entry)
+    if list(entry['generations']) != list(generations):
+        # ETag прежней версии: conditional_view не выставит ETag новых
+        # поколений, и клиент не получит 304 на устаревшее содержимое
+        response['ETag'] = quote_etag(
+            _etag(entry['generations'], request))
+    return response
+
+
+def _store(key, response, generations, timeout, delta):
+    cache.set(
+        key,
+        {
+            'generations': generations,
+            'content': response.content,
+            'content_type': response['Content-Type'],
+            'expires': time.time() + timeout,
+            'delta': delta,
+        },
+        timeout + settings.CACHE_STALE_TIME,
+    )
+
+
+def _cached_response(entry):
+    return HttpResponse(
+        entry['content'], content_type=entry['content_type'])
+
+
+def conditional_view(scopes):
+    """Отвечает 304 на повторный запрос, пока страница не изменилась.
+
+    ETag строится из поколений областей scopes(request, *args, **kwargs),
+    пользователя и CSRF-cookie: страница с формой несёт токен своей
+    cookie и после её смены должна отрисоваться заново. Проверка стоит
+    лишь чтения счётчиков из кеша и выполняется до тяжёлых запросов
+    к базе.
+    """
+    def etag(request, *args, **kwargs):
+        generations = _request_generations(scopes, request, args, kwargs)
+        if generations is None:
+            return None
+        return _etag(generations, request)
+    return condition(etag_func=etag)
+
+
+def _etag(generations, request):
+    return _digest(
+        *generations,
+        request.user.pk or '',
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+    )
@@ -0,0 +1,154 @@
+"""Отдача загруженных файлов из MEDIA_ROOT.
+
+Если перед приложением стоит nginx или Apache, передачу файла берёт
+на себя он: ответ содержит только заголовок X-Accel-Redirect (nginx,
+адрес во внутреннем location MEDIA_ACCEL_PREFIX) или X-Sendfile (Apache,
+lighttpd, путь к файлу), и рабочий процесс сразу освобождается. Без
+фронтенда (MEDIA_ACCEL = None) файл отдаёт сам Django: по частям,
+с поддержкой Range, ETag и If-None-Match.
+
+Имена файлов в хранилищах не переиспользуются (картинки постов
+адресуются по содержимому), поэтому ответы кешируются надолго.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.http import (FileResponse, HttpResponse, HttpResponseNotModified,
+                         StreamingHttpResponse)
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date, parse_etags
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+ACCEL_MODES = ('x-accel-redirect', 'x-sendfile')
+
+
+def check_settings():
+    """Падает при запуске, если MEDIA_ACCEL задан с опечаткой.
+
+    Иначе неизвестное значение молча отдавало бы X-Sendfile.
+    """
+    if settings.MEDIA_ACCEL not in (None, *ACCEL_MODES):
+        raise ImproperlyConfigured(
+            f'MEDIA_ACCEL={settings.MEDIA_ACCEL!r}: допустимы '
+            f'{", ".join(ACCEL_MODES)} или пустое значение.'
+        )
+
+
+def file_etag(stat):
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def _etag_matches(header, etag):
+    return header.strip() == '*' or etag in parse_etags(header)
+
+
+def parse_range(header, size):
+    """Границы (начало, конец включительно) одного диапазона Range.
+
+    None — заголовок не разобран или диапазонов несколько: отдаётся весь
+    файл. ValueError — диапазон за пределами файла.
+    """
+    match = RANGE_RE.match(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        # bytes=-500 — последние 500 байт
+        length = int(last)
+        if length == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def _read_slice(path, start, length):
+    with open(path, 'rb') as source:
+        source.seek(start)
+        while length > 0:
+            chunk = source.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                return
+            length -= len(chunk)
+            yield chunk
+
+
+def _accelerated(path, name, accel_prefix):
+    response = HttpResponse()
+    if settings.MEDIA_ACCEL == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = accel_prefix + quote(name)
+    else:
+        response['X-Sendfile'] = path
+    # Тип и длину выставит фронтенд
+    del response['Content-Type']
+    return response
+
+
+def _ranged(request, path, stat, etag):
+    """Ответ 206 или 416 на Range; None — отдать файл целиком."""
+    header = request.META.get('HTTP_RANGE')
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not header or (if_range and if_range.strip() != etag):
+        return None
+    try:
+        bounds = parse_range(header, stat.st_size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+        return response
+    if bounds is None:
+        return None
+    start, end = bounds
+    length = end - start + 1
+    response = StreamingHttpResponse(
+        _read_slice(path, start, length), status=206)
+    response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+    response['Content-Length'] = length
+    return response
+
+
+def file_response(request, path, name, accel_prefix=None):
+    """Ответ с файлом path.
+
+    name — имя файла относительно каталога, который nginx отдаёт
+    во внутреннем location accel_prefix (по умолчанию MEDIA_ACCEL_PREFIX
+    для MEDIA_ROOT).
+    """
+    if accel_prefix is None:
+        accel_prefix = settings.MEDIA_ACCEL_PREFIX
+    stat = os.stat(path)
+    etag = file_etag(stat)
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match and _etag_matches(if_none_match, etag):
+        response = HttpResponseNotModified()
+    elif settings.MEDIA_ACCEL:
+        response = _accelerated(path, name, accel_prefix)
+    else:
+        response = _ranged(request, path, stat, etag)
+        if response is None:
+            response = FileResponse(open(path, 'rb'))
+        content_type, encoding = mimetypes.guess_type(path)
+        response['Content-Type'] = (
+            content_type or 'application/octet-stream')
+        if encoding:
+            response['Content-Encoding'] = encoding
+        response['Accept-Ranges'] = 'bytes'
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        if response.status_code == 416:
+            return response
+    response['ETag'] = etag
+    patch_cache_control(
+        response, public=True, max_age=settings.MEDIA_CACHE_MAX_AGE,
+        immutable=True,
+    )
+    return response
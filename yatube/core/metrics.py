@@ -0,0 +1,113 @@
+"""Замеры обработки запроса: SQL, шаблоны, кеш, миниатюры.
+
+ServerTimingMiddleware открывает для запроса набор замеров, а код
+приложения пополняет его через timed и count. Вне запроса (в командах,
+фоновых потоках) замеров нет и обе функции ничего не делают.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Суммарные длительности (мс) и счётчики одного запроса."""
+
+    def __init__(self):
+        self.durations = {}
+        self.counts = {}
+        self._active = set()
+
+    def add(self, name, duration):
+        self.durations[name] = self.durations.get(name, 0.0) + duration
+
+    def count(self, name, value=1):
+        self.counts[name] = self.counts.get(name, 0) + value
+
+
+def start():
+    """Открывает замеры запроса; токен передаётся в finish."""
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def finish(token):
+    _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+@contextmanager
+def timed(name):
+    """Прибавляет время блока к замеру name.
+
+    Вложенные блоки с тем же именем не учитываются повторно: шаблон,
+    отрисованный внутри другого, уже входит в его время.
+    """
+    metrics = _current.get()
+    if metrics is None or name in metrics._active:
+        yield
+        return
+    metrics._active.add(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics._active.discard(name)
+        metrics.add(name, (time.perf_counter() - started) * 1000)
+
+
+def count(name, value=1):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.count(name, value)
+
+
+class QueryTimer:
+    """Обёртка для connection.execute_wrapper: время и число запросов."""
+
+    def __call__(self, execute, sql, params, many, context):
+        count('sql')
+        with timed('sql'):
+            return execute(sql, params, many, context)
+
+
+def server_timing(metrics):
+    """Значение заголовка Server-Timing."""
+    durations, counts = metrics.durations, metrics.counts
+    parts = [
+        'sql;dur={:.1f};desc="{} queries"'.format(
+            durations.get('sql', 0.0), counts.get('sql', 0)),
+        'tpl;dur={:.1f}'.format(durations.get('tpl', 0.0)),
+        'cache;dur={:.1f};desc="hits={} misses={}"'.format(
+            durations.get('cache', 0.0),
+            counts.get('cache_hits', 0), counts.get('cache_misses', 0)),
+    ]
+    if 'thumb' in durations:
+        parts.append('thumb;dur={:.1f};desc="{} renders"'.format(
+            durations['thumb'], counts.get('thumb', 0)))
+    parts.append('total;dur={:.1f}'.format(durations.get('total', 0.0)))
+    return ', '.join(parts)
+
+
+def log_record(metrics, view_name, request, status):
+    """Поля строки журнала о запросе."""
+    durations, counts = metrics.durations, metrics.counts
+    return {
+        'view': view_name,
+        'method': request.method,
+        'path': request.path,
+        'status': status,
+        'total_ms': round(durations.get('total', 0.0), 2),
+        'sql_ms': round(durations.get('sql', 0.0), 2),
+        'sql_count': counts.get('sql', 0),
+        'tpl_ms': round(durations.get('tpl', 0.0), 2),
+        'cache_ms': round(durations.get('cache', 0.0), 2),
+        'cache_hits': counts.get('cache_hits', 0),
+        'cache_misses': counts.get('cache_misses', 0),
+        'thumb_ms': round(durations.get('thumb', 0.0), 2),
+        'thumb_count': counts.get('thumb', 0),
+    }
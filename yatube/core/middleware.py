@@ -0,0 +1,85 @@
+import json
+import logging
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+from . import metrics
+from .query_budget import QueryBudgetExceeded, QueryCounter, budget_for
+
+logger = logging.getLogger(__name__)
+metrics_logger = logging.getLogger('core.metrics')
+
+
+class QueryBudgetMiddleware:
+    """Проверяет число SQL-запросов запроса по бюджету представления.
+
+    Работает только при отладке. QUERY_BUDGET_MODE = 'raise' превращает
+    превышение в ошибку, 'log' только пишет предупреждение. Число
+    запросов отдаётся в заголовке X-Query-Count.
+    """
+
+    def __init__(self, get_response):
+        if not settings.DEBUG:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+        response['X-Query-Count'] = counter.count
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return response
+        budget = budget_for(match)
+        if counter.count > budget:
+            message = (
+                f'{match.view_name}: {counter.count} SQL-запросов '
+                f'при бюджете {budget} ({request.get_full_path()})'
+            )
+            if settings.QUERY_BUDGET_MODE == 'raise':
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+
+class ServerTimingMiddleware:
+    """Замеряет обработку запроса и сообщает, куда ушло время.
+
+    Время и число SQL-запросов, время отрисовки шаблонов, попадания
+    и промахи кеша, построение миниатюр и полное время ответа
+    отдаются в заголовке Server-Timing (SERVER_TIMING) и пишутся строкой
+    JSON в журнал core.metrics с именем представления (SERVER_TIMING_LOG).
+    """
+
+    def __init__(self, get_response):
+        if not (settings.SERVER_TIMING or settings.SERVER_TIMING_LOG):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_metrics, token = metrics.start()
+        try:
+            with metrics.timed('total'):
+                with connection.execute_wrapper(metrics.QueryTimer()):
+                    response = self.get_response(request)
+        finally:
+            metrics.finish(token)
+        if settings.SERVER_TIMING:
+            response['Server-Timing'] = metrics.server_timing(
+                request_metrics)
+        if settings.SERVER_TIMING_LOG:
+            match = getattr(request, 'resolver_match', None)
+            record = metrics.log_record(
+                request_metrics,
+                match.view_name if match is not None else None,
+                request,
+                response.status_code,
+            )
+            metrics_logger.info(
+                json.dumps(record, ensure_ascii=False),
+                extra={'metrics': record},
+            )
+        return response
@@ -0,0 +1,82 @@
+"""Бюджеты SQL-запросов представлений.
+
+Бюджет представления задаёт декоратор query_budget, атрибут query_budget
+класса представления или словарь QUERY_BUDGETS в настройках (по имени
+адреса, например 'users:login'); иначе действует QUERY_BUDGET_DEFAULT.
+Бюджет учитывает все запросы обработки, включая сессию и пользователя.
+"""
+import importlib
+
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+
+
+class QueryBudgetExceeded(Exception):
+    """Представление выполнило больше запросов, чем разрешено."""
+
+
+def query_budget(limit):
+    """Объявляет, сколько SQL-запросов может выполнить представление."""
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+def budget_for(resolver_match):
+    """Бюджет представления, к которому привёл адрес."""
+    budgets = settings.QUERY_BUDGETS
+    if resolver_match.view_name in budgets:
+        return budgets[resolver_match.view_name]
+    view = resolver_match.func
+    view = getattr(view, 'view_class', view)
+    return getattr(view, 'query_budget', settings.QUERY_BUDGET_DEFAULT)
+
+
+class QueryCounter:
+    """Обёртка для connection.execute_wrapper, считающая запросы."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def urlconf_urls(modules, kwargs):
+    """Адреса всех шаблонов из модулей urls; параметры берутся из kwargs.
+
+    Возвращает пары (имя адреса, путь).
+    """
+    urls = []
+    for module_name in modules:
+        module = importlib.import_module(module_name)
+        for pattern in module.urlpatterns:
+            name = f'{module.app_name}:{pattern.name}'
+            params = {
+                param: kwargs[param] for param in pattern.pattern.converters
+            }
+            urls.append((name, reverse(name, kwargs=params)))
+    return urls
+
+
+def over_budget(client, urls, before_request=None):
+    """Запрашивает адреса и возвращает превышения бюджета.
+
+    Каждое превышение — кортеж (имя адреса, запросов, бюджет).
+    before_request вызывается перед каждым запросом, например чтобы
+    очистить кеш.
+    """
+    exceeded = []
+    for name, url in urls:
+        if before_request is not None:
+            before_request()
+        with CaptureQueriesContext(connection) as queries:
+            client.get(url)
+        budget = budget_for(resolve(url))
+        if len(queries) > budget:
+            exceeded.append((name, len(queries), budget))
+    return exceeded
@@ -0,0 +1,68 @@
+import os
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from ..cache_backends import SQLiteCache
+from ..caching import acquire_lock, release_lock, wait_for
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        location = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = SQLiteCache(location, {'KEY_PREFIX': 'test'})
+        self.other = SQLiteCache(location, {'KEY_PREFIX': 'test'})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_values_are_shared_between_instances(self):
+        """Экземпляры с одним файлом видят общие значения."""
+        self.cache.set('key', {'value': 1})
+        self.assertEqual(self.other.get('key'), {'value': 1})
+        self.cache.set_many({'a': 1, 'b': 'два'})
+        self.assertEqual(
+            self.other.get_many(['a', 'b', 'c']), {'a': 1, 'b': 'два'})
+        self.other.delete_many(['a', 'b'])
+        self.assertEqual(self.cache.get_many(['a', 'b']), {})
+
+    def test_add_and_incr(self):
+        """add не перезаписывает значение, incr атомарно его меняет."""
+        self.assertTrue(self.cache.add('counter', 1))
+        self.assertFalse(self.other.add('counter', 5))
+        self.assertEqual(self.other.incr('counter'), 2)
+        self.assertEqual(self.cache.incr('counter', 10), 12)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_expired_values_are_missing(self):
+        """Просроченные значения не возвращаются и не мешают add."""
+        self.cache.set('key', 'value', 0)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertFalse(self.cache.has_key('key'))
+        self.assertTrue(self.cache.add('key', 'new'))
+        self.assertEqual(self.other.get('key'), 'new')
+
+
+@override_settings(CACHE_LOCK_TIMEOUT=0.2, CACHE_LOCK_POLL=0.01)
+class CacheLockTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_lock_has_single_owner(self):
+        """Блокировку ключа держит один владелец до её снятия."""
+        self.assertTrue(acquire_lock('hot'))
+        self.assertFalse(acquire_lock('hot'))
+        release_lock('hot')
+        self.assertTrue(acquire_lock('hot'))
+        release_lock('hot')
+
+    def test_wait_for_value(self):
+        """wait_for отдаёт появившееся значение или None по истечении срока."""
+        cache.set('hot', 'готово')
+        self.assertEqual(wait_for('hot'), 'готово')
+        cache.delete('hot')
+        self.assertIsNone(wait_for('hot'))
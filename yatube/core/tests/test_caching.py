@@ -0,0 +1,108 @@
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.test import RequestFactory, SimpleTestCase
+
+from ..caching import (_digest, acquire_lock, bump_generation, cache_view,
+                       conditional_view, is_fresh, release_lock,
+                       versioned_key)
+
+
+class GenerationCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.calls = 0
+
+    def view(self, request):
+        self.calls += 1
+        return HttpResponse(f'ответ {self.calls}')
+
+    def test_versioned_key_changes_after_bump(self):
+        """Ключ меняется только при смене поколения своей области."""
+        key = versioned_key('page', ['a', 'b'], '/')
+        self.assertEqual(key, versioned_key('page', ['a', 'b'], '/'))
+        bump_generation('c')
+        self.assertEqual(key, versioned_key('page', ['a', 'b'], '/'))
+        bump_generation('b')
+        self.assertNotEqual(key, versioned_key('page', ['a', 'b'], '/'))
+
+    def get_request(self):
+        request = self.factory.get('/')
+        request.user = AnonymousUser()
+        return request
+
+    def test_cache_view(self):
+        """Ответ берётся из кеша до смены поколения области."""
+        view = cache_view(lambda request: ['scope'], timeout=60)(self.view)
+        first = view(self.get_request())
+        second = view(self.get_request())
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(self.calls, 1)
+        bump_generation('scope')
+        self.assertNotEqual(view(self.get_request()).content, first.content)
+        self.assertEqual(self.calls, 2)
+
+    def test_page_with_csrf_token_is_not_cached(self):
+        """Страница с CSRF-токеном не кешируется и не делит ключ по cookie."""
+        def view(request):
+            get_token(request)
+            return self.view(request)
+        view = cache_view(lambda request: ['scope'], timeout=60)(view)
+        view(self.get_request())
+        view(self.get_request())
+        self.assertEqual(self.calls, 2)
+
+    def test_stale_page_is_served_while_refreshing(self):
+        """Пока страницу пересчитывает другой запрос, отдаётся старая."""
+        view = cache_view(lambda request: ['scope'], timeout=60)(self.view)
+        first = view(self.get_request())
+        bump_generation('scope')
+        key = 'view:' + _digest('/', '')
+        self.assertTrue(acquire_lock(key))
+        self.assertEqual(view(self.get_request()).content, first.content)
+        self.assertEqual(self.calls, 1)
+        release_lock(key)
+        self.assertNotEqual(view(self.get_request()).content, first.content)
+        self.assertEqual(self.calls, 2)
+
+    def test_stale_page_keeps_its_etag(self):
+        """Старая страница не получает ETag новых поколений."""
+        def scopes(request):
+            return ['scope']
+        view = conditional_view(scopes)(
+            cache_view(scopes, timeout=60)(self.view))
+        etag = view(self.get_request())['ETag']
+        bump_generation('scope')
+        key = 'view:' + _digest('/', '')
+        self.assertTrue(acquire_lock(key))
+        stale = view(self.get_request())
+        self.assertEqual(stale['ETag'], etag)
+        release_lock(key)
+        response = view(self.get_request())
+        self.assertNotEqual(response['ETag'], etag)
+        request = self.get_request()
+        request.META['HTTP_IF_NONE_MATCH'] = response['ETag']
+        self.assertEqual(view(request).status_code, 304)
+        request = self.get_request()
+        request.META['HTTP_IF_NONE_MATCH'] = etag
+        self.assertEqual(view(request).content, response.content)
+
+    def test_is_fresh(self):
+        """Запись свежа до срока и при неизменных поколениях."""
+        entry = {
+            'generations': [1],
+            'expires': time.time() + 60,
+            'delta': 0.01,
+        }
+        self.assertTrue(is_fresh(entry, [1]))
+        self.assertFalse(is_fresh(entry, [2]))
+        entry['expires'] = time.time() - 1
+        self.assertFalse(is_fresh(entry, [1]))
+        # Долгий пересчёт делает ранний пересчёт почти неизбежным
+        entry.update(expires=time.time() + 1, delta=1000)
+        self.assertFalse(is_fresh(entry, [1], beta=1.0))
+        self.assertTrue(is_fresh(entry, [1], beta=0))
@@ -0,0 +1,108 @@
+import os
+import shutil
+import tempfile
+from http import HTTPStatus
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+CONTENT = bytes(range(256)) * 4
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, MEDIA_ACCEL=None)
+class MediaTests(TestCase):
+    url = '/media/posts/ab/picture.png'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        os.makedirs(os.path.join(TEMP_MEDIA_ROOT, 'posts', 'ab'))
+        with open(os.path.join(
+                TEMP_MEDIA_ROOT, 'posts', 'ab', 'picture.png'), 'wb') as file:
+            file.write(CONTENT)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_full_file(self):
+        """Файл отдаётся целиком с типом, длиной и долгим кешем."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(response['Content-Length'], str(len(CONTENT)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('max-age=31536000', response['Cache-Control'])
+
+    def test_ranges(self):
+        """Range отдаёт запрошенный кусок файла с ответом 206."""
+        cases = (
+            ('bytes=10-19', CONTENT[10:20], 'bytes 10-19/1024'),
+            ('bytes=1000-', CONTENT[1000:], 'bytes 1000-1023/1024'),
+            ('bytes=-4', CONTENT[-4:], 'bytes 1020-1023/1024'),
+        )
+        for header, body, content_range in cases:
+            with self.subTest(header=header):
+                response = self.client.get(self.url, HTTP_RANGE=header)
+                self.assertEqual(
+                    response.status_code, HTTPStatus.PARTIAL_CONTENT)
+                self.assertEqual(b''.join(response.streaming_content), body)
+                self.assertEqual(response['Content-Range'], content_range)
+                self.assertEqual(response['Content-Length'], str(len(body)))
+
+    def test_unsatisfiable_range(self):
+        """Диапазон за концом файла получает 416."""
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2000-')
+        self.assertEqual(
+            response.status_code,
+            HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE,
+        )
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+
+    def test_stale_if_range_returns_whole_file(self):
+        """При устаревшем If-Range файл отдаётся целиком."""
+        response = self.client.get(
+            self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"old"')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_not_modified(self):
+        """Совпавший If-None-Match получает 304."""
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_missing_and_outside_files(self):
+        """Несуществующие файлы и пути вне MEDIA_ROOT дают 404."""
+        for url in ('/media/posts/missing.png', '/media/../settings.py',
+                    '/media/posts'):
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.client.get(url).status_code, HTTPStatus.NOT_FOUND)
+
+    def test_front_server_handoff(self):
+        """С фронтендом ответ содержит только заголовок передачи файла."""
+        cases = (
+            ('x-accel-redirect', 'X-Accel-Redirect',
+             '/protected-media/posts/ab/picture.png'),
+            ('x-sendfile', 'X-Sendfile',
+             os.path.join(TEMP_MEDIA_ROOT, 'posts', 'ab', 'picture.png')),
+        )
+        for accel, header, value in cases:
+            with self.subTest(accel=accel), override_settings(
+                    MEDIA_ACCEL=accel):
+                response = self.client.get(self.url)
+                self.assertEqual(response[header], value)
+                self.assertEqual(response.content, b'')
+                self.assertIn('ETag', response)
+
+    @override_settings(MEDIA_ACCEL='nginx')
+    def test_unknown_accel_rejected_at_startup(self):
+        """Неизвестное значение MEDIA_ACCEL останавливает запуск."""
+        with self.assertRaises(ImproperlyConfigured):
+            apps.get_app_config('core').ready()
@@ -0,0 +1,76 @@
+import json
+import logging
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Group, Post, User
+
+from .. import metrics
+
+
+@override_settings(SERVER_TIMING=True)
+class ServerTimingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        Post.objects.create(
+            author=cls.author, group=cls.group, text='Текст поста')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_header_reports_every_metric(self):
+        """Заголовок содержит время SQL, шаблонов, кеша и всего ответа."""
+        response = self.client.get(reverse('posts:index'))
+        timing = response['Server-Timing']
+        for metric in ('sql;dur=', 'tpl;dur=', 'cache;dur=', 'total;dur='):
+            with self.subTest(metric=metric):
+                self.assertIn(metric, timing)
+        self.assertRegex(timing, r'desc="[1-9]\d* queries"')
+
+    def test_cache_hits_after_warm_up(self):
+        """Повторный запрос страницы показывает попадания в кеш."""
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        self.client.get(url)
+        response = self.client.get(url)
+        self.assertRegex(response['Server-Timing'], r'hits=[1-9]')
+
+    def test_log_line_tagged_with_view_name(self):
+        """Строка журнала в JSON содержит имя представления и статус."""
+        with self.assertLogs('core.metrics', 'INFO') as logs:
+            self.client.get(reverse('posts:index'))
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(record['view'], 'posts:index')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['sql_count'], 0)
+        self.assertEqual(logs.records[-1].metrics, record)
+
+    def test_log_has_own_handler(self):
+        """Журнал замеров выводится своим обработчиком, а не отбрасывается."""
+        logger = logging.getLogger('core.metrics')
+        self.assertTrue(logger.handlers)
+        self.assertFalse(logger.propagate)
+
+    @override_settings(SERVER_TIMING=False)
+    def test_header_can_be_disabled(self):
+        """SERVER_TIMING=False убирает заголовок."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotIn('Server-Timing', response)
+
+    def test_nested_blocks_counted_once(self):
+        """Вложенный блок с тем же именем не учитывается дважды."""
+        request_metrics, token = metrics.start()
+        try:
+            with metrics.timed('tpl'):
+                with metrics.timed('tpl'):
+                    pass
+            metrics.count('sql', 2)
+        finally:
+            metrics.finish(token)
+        self.assertEqual(list(request_metrics.durations), ['tpl'])
+        self.assertEqual(request_metrics.counts, {'sql': 2})
+        self.assertIsNone(metrics.current())
@@ -0,0 +1,66 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import transforms
+from posts.models import Group, Post, User
+
+from ..query_budget import (QueryBudgetExceeded, over_budget, query_budget,
+                            urlconf_urls)
+
+URLCONFS = ('posts.urls', 'users.urls', 'about.urls')
+
+
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command(
+            'seed_data', '--users=30', '--groups=3', '--posts=200',
+            '--comments=300', '--follows=100', '--seed=1', stdout=StringIO(),
+        )
+        cls.reader = User.objects.order_by(
+            '-counters__following_count').first()
+        author = User.objects.order_by('-counters__followers_count').first()
+        cls.urls = urlconf_urls(URLCONFS, {
+            'slug': Group.objects.order_by('-posts_count').first().slug,
+            'username': author.username,
+            'post_id': Post.objects.filter(author=author).order_by(
+                '-comments_count').first().pk,
+            'token': transforms.sign('posts/missing.png', 10, 10),
+        })
+
+    def test_urls_fit_budgets(self):
+        """Все адреса укладываются в бюджеты даже без кеша."""
+        for user in (None, self.reader):
+            client = Client()
+
+            def before_request():
+                cache.clear()
+                # Адрес выхода разлогинивает клиента
+                if user is not None:
+                    client.force_login(user)
+
+            with self.subTest(user=user):
+                self.assertEqual(
+                    over_budget(client, self.urls, before_request), [])
+
+    @override_settings(DEBUG=True, QUERY_BUDGET_MODE='raise')
+    def test_middleware_raises_over_budget(self):
+        """При отладке превышение бюджета приводит к ошибке."""
+        cache.clear()
+        response = Client().get(reverse('about:author'))
+        self.assertEqual(response['X-Query-Count'], '0')
+        with self.settings(QUERY_BUDGETS={'posts:index': 0}):
+            with self.assertRaises(QueryBudgetExceeded):
+                Client().get(reverse('posts:index'))
+
+    def test_decorator(self):
+        """query_budget записывает бюджет в атрибут представления."""
+        @query_budget(3)
+        def view(request):
+            pass
+        self.assertEqual(view.query_budget, 3)
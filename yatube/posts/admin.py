@@ -1,5 +1,72 @@
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+
+from core.caching import versioned_key
+
+from .counts import get_feed_count
 from .models import Post, Group
+from .search import search_posts
+from .versions import GROUPS
+
+
+def group_choices():
+    """Пары (id, название) всех групп; кешируются до изменения групп."""
+    key = versioned_key('admin_group_choices', [GROUPS])
+    choices = cache.get(key)
+    if choices is None:
+        choices = list(
+            Group.objects.order_by('title').values_list('pk', 'title'))
+        cache.set(key, choices, settings.CACHING_TIME)
+    return choices
+
+
+class CachedGroupSelect(AutocompleteSelect):
+    """Автодополнение группы, которое берёт выбранную группу из кеша.
+
+    Стандартный виджет запрашивает выбранную группу из базы для каждой
+    строки list_editable.
+    """
+
+    def optgroups(self, name, value, attr=None):
+        labels = {str(pk): title for pk, title in group_choices()}
+        options = []
+        if not self.is_required:
+            options.append(self.create_option(name, '', '', False, 0))
+        for pk in value:
+            if str(pk) in labels:
+                options.append(self.create_option(
+                    name, pk, labels[str(pk)], True, len(options)))
+        return [(None, options, 0)]
+
+
+class GroupListFilter(admin.SimpleListFilter):
+    title = 'группа'
+    parameter_name = 'group'
+
+    def lookups(self, request, model_admin):
+        return group_choices()
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(group_id=self.value())
+        return queryset
+
+
+class PostPaginator(Paginator):
+    """Без фильтров размер списка берётся из кешированного счётчика ленты.
+
+    Для огромной таблицы это оценка из статистики СУБД, а не COUNT(*).
+    """
+
+    @cached_property
+    def count(self):
+        if self.object_list.query.where:
+            return super().count
+        return get_feed_count(self.object_list, 'index')
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -10,10 +77,33 @@ class PostAdmin(admin.ModelAdmin):
                     'group',
                     )
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
+    autocomplete_fields = ('author', 'group')
     search_fields = ('text',)
-    list_filter = ('pub_date',)
+    list_filter = ('pub_date', GroupListFilter)
     empty_value_display = '-пусто-'
+    paginator = PostPaginator
+    show_full_result_count = False
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'group':
+            kwargs['widget'] = CachedGroupSelect(
+                db_field.remote_field, self.admin_site,
+                using=kwargs.get('using'),
+            )
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по полнотекстовому индексу вместо LIKE '%...%' по тексту
+        if not search_term.strip():
+            return queryset, False
+        return search_posts(queryset, search_term, ranked=False), False
+
+
+class GroupAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'title', 'slug')
+    search_fields = ('title',)
 
 
 admin.site.register(Post, PostAdmin)
-admin.site.register(Group)
+admin.site.register(Group, GroupAdmin)
@@ -0,0 +1,98 @@
+"""Замеры времени ответа, числа запросов и объёма страниц.
+
+Каждая страница запрашивается тестовым клиентом несколько раз подряд;
+по замерам считаются перцентили задержки. Страницы выбираются по самым
+тяжёлым объектам базы: крупнейшая группа, автор с наибольшим числом
+подписчиков, пост с наибольшим числом комментариев и читатель
+с наибольшим числом подписок.
+"""
+import math
+import time
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import Group, Post, User
+
+
+def percentile(values, percent):
+    """Перцентиль по ближайшему рангу."""
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def measure(client, url, requests, warmup=1):
+    """Статистика ответов client на requests запросов к url."""
+    for _ in range(warmup):
+        client.get(url)
+    timings, queries, sizes = [], [], []
+    for _ in range(requests):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = client.get(url)
+            timings.append((time.perf_counter() - started) * 1000)
+        queries.append(len(captured))
+        sizes.append(len(response.content))
+    return {
+        'url': url,
+        'status': response.status_code,
+        'requests': requests,
+        'p50_ms': round(percentile(timings, 50), 2),
+        'p95_ms': round(percentile(timings, 95), 2),
+        'p99_ms': round(percentile(timings, 99), 2),
+        'max_ms': round(max(timings), 2),
+        'queries_avg': round(sum(queries) / requests, 2),
+        'queries_max': max(queries),
+        'bytes_avg': round(sum(sizes) / requests),
+    }
+
+
+def benchmark_targets(page=None):
+    """Пары (имя, адрес, пользователь) страниц для замеров."""
+    query = f'?page={page}' if page else ''
+    targets = [('index', reverse('posts:index') + query, None)]
+    group = Group.objects.order_by('-posts_count').first()
+    if group is not None:
+        targets.append((
+            'group_posts',
+            reverse('posts:group_list', kwargs={'slug': group.slug}) + query,
+            None,
+        ))
+    author = User.objects.order_by('-counters__followers_count').first()
+    if author is not None:
+        targets.append((
+            'profile',
+            reverse('posts:profile', kwargs={'username': author.username})
+            + query,
+            None,
+        ))
+    post_id = Post.objects.order_by('-comments_count').values_list(
+        'pk', flat=True).first()
+    if post_id is not None:
+        targets.append((
+            'post_detail',
+            reverse('posts:post_detail', kwargs={'post_id': post_id}),
+            None,
+        ))
+    reader = User.objects.order_by('-counters__following_count').first()
+    if reader is not None:
+        targets.append((
+            'follow_index', reverse('posts:follow_index') + query, reader))
+    return targets
+
+
+def run_benchmark(requests, warmup=1, page=None, views=None):
+    """Результаты замеров всех страниц, по одному словарю на страницу."""
+    results = []
+    for name, url, user in benchmark_targets(page):
+        if views and name not in views:
+            continue
+        client = Client()
+        if user is not None:
+            client.force_login(user)
+        result = measure(client, url, requests, warmup)
+        results.append({'view': name, **result})
+    return results
@@ -0,0 +1,87 @@
+"""Кешированные счётчики постов в лентах.
+
+Паджинатору нужен общий размер ленты. Точный COUNT(*) выполняется только
+при промахе кеша, а сигналы Post и Follow сбрасывают затронутые ключи.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+
+FEED_COUNT_KEY = 'feed_count:{feed}:{pk}'
+
+
+def feed_count_key(feed, pk=None):
+    return FEED_COUNT_KEY.format(feed=feed, pk=pk or '')
+
+
+def approximate_count(model):
+    """Оценка числа строк таблицы из статистики СУБД.
+
+    Возвращает None, если статистика недоступна.
+    """
+    table = model._meta.db_table
+    if connection.vendor == 'postgresql':
+        sql = 'SELECT reltuples::bigint FROM pg_class WHERE relname = %s'
+    elif connection.vendor == 'mysql':
+        sql = (
+            'SELECT table_rows FROM information_schema.tables '
+            'WHERE table_schema = DATABASE() AND table_name = %s'
+        )
+    elif connection.vendor == 'sqlite':
+        # Заполняется командой ANALYZE
+        sql = 'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1'
+    else:
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [table])
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    if row is None or row[0] is None:
+        return None
+    try:
+        return int(str(row[0]).split()[0])
+    except ValueError:
+        return None
+
+
+def get_feed_count(queryset, feed, pk=None):
+    """Размер ленты feed из кеша или из базы.
+
+    Для неотфильтрованной ленты огромной таблицы берётся оценка
+    из статистики СУБД вместо точного подсчёта.
+    """
+    key = feed_count_key(feed, pk)
+    count = cache.get(key)
+    if count is not None:
+        return count
+    count = None
+    if not queryset.query.where:
+        estimate = approximate_count(queryset.model)
+        if (estimate is not None
+                and estimate >= settings.APPROXIMATE_COUNT_THRESHOLD):
+            count = estimate
+    if count is None:
+        count = queryset.count()
+    cache.set(key, count, settings.FEED_COUNT_TIMEOUT)
+    return count
+
+
+def invalidate_post_feeds(author_id, group_ids=()):
+    """Сбрасывает счётчики лент, в которые входит пост."""
+    keys = [feed_count_key('index'), feed_count_key('profile', author_id)]
+    keys.extend(
+        feed_count_key('group', group_id)
+        for group_id in group_ids if group_id is not None
+    )
+    cache.delete_many(keys)
+
+
+def invalidate_follow_feed(user_id):
+    cache.delete(feed_count_key('follow', user_id))
+
+
+def invalidate_follow_feeds(user_ids):
+    cache.delete_many(
+        [feed_count_key('follow', user_id) for user_id in user_ids])
@@ -0,0 +1,71 @@
+"""Потоковая выгрузка постов автора или группы в JSONL и CSV.
+
+Посты читаются из базы частями по EXPORT_CHUNK_SIZE и сразу
+превращаются в строки файла, поэтому память не зависит от числа постов.
+Записи совместимы с командой import_content.
+"""
+import csv
+import json
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+EXPORT_FIELDS = (
+    'type', 'id', 'author', 'group', 'text', 'pub_date',
+    'image', 'image_url', 'comments_count',
+)
+CONTENT_TYPES = {
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+def export_records(posts, build_url=None):
+    """Словари для выгрузки постов queryset posts.
+
+    build_url превращает адрес картинки в абсолютный.
+    """
+    rows = posts.order_by('-pub_date', '-pk').values_list(
+        'pk', 'author__username', 'group__slug', 'text', 'pub_date',
+        'image', 'comments_count',
+    ).iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+    for pk, author, group, text, pub_date, image, comments_count in rows:
+        image_url = default_storage.url(image) if image else ''
+        if image_url and build_url is not None:
+            image_url = build_url(image_url)
+        yield {
+            'type': 'post',
+            'id': pk,
+            'author': author,
+            'group': group or '',
+            'text': text,
+            'pub_date': pub_date.isoformat(),
+            'image': image,
+            'image_url': image_url,
+            'comments_count': comments_count,
+        }
+
+
+class _Echo:
+    """Буфер для csv.writer, который сразу возвращает записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def jsonl_lines(records):
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+def csv_lines(records):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for record in records:
+        yield writer.writerow([record[field] for field in EXPORT_FIELDS])
+
+
+def export_lines(records, file_format):
+    if file_format == 'csv':
+        return csv_lines(records)
+    return jsonl_lines(records)
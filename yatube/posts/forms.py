@@ -1,5 +1,8 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
+
 from .models import Post, Comment
+from .uploads import normalize_image
 
 
 class PostForm(forms.ModelForm):
@@ -7,6 +10,16 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            image = normalize_image(image)
+            self.instance.image_width = image.width
+            self.instance.image_height = image.height
+        elif not image:
+            self.instance.image_width = self.instance.image_height = None
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
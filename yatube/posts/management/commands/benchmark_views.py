@@ -0,0 +1,65 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from posts.benchmark import run_benchmark
+
+VIEWS = ('index', 'group_posts', 'profile', 'post_detail', 'follow_index')
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет задержку (p50/p95/p99), число запросов и объём '
+        'страниц лент и поста.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help='Запросов к каждой странице.',
+        )
+        parser.add_argument(
+            '--warmup', type=int, default=1,
+            help='Запросов для прогрева перед замером.',
+        )
+        parser.add_argument(
+            '--page', type=int,
+            help='Номер страницы лент, например глубокой.',
+        )
+        parser.add_argument(
+            '--view', action='append', choices=VIEWS, dest='views',
+            help='Замерять только эти представления.',
+        )
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Без кеша: каждая страница строится заново.',
+        )
+        parser.add_argument(
+            '--output', help='Файл для результатов в JSON.')
+
+    def handle(self, *args, **options):
+        arguments = (
+            options['requests'], options['warmup'],
+            options['page'], options['views'],
+        )
+        if options['cold']:
+            with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+            }}):
+                results = run_benchmark(*arguments)
+        else:
+            results = run_benchmark(*arguments)
+        for result in results:
+            self.stdout.write(
+                '{view:<14} p50 {p50_ms:>8} мс  p95 {p95_ms:>8} мс  '
+                'p99 {p99_ms:>8} мс  запросов {queries_avg:>6}  '
+                'байт {bytes_avg:>8}'.format(**result)
+            )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as target:
+                json.dump({
+                    'cold': options['cold'],
+                    'page': options['page'],
+                    'results': results,
+                }, target, ensure_ascii=False, indent=2)
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.exporter import export_lines, export_records
+from posts.models import Group, Post, User
+
+
+class Command(BaseCommand):
+    help = 'Выгружает посты автора или группы в JSONL или CSV.'
+
+    def add_arguments(self, parser):
+        source = parser.add_mutually_exclusive_group(required=True)
+        source.add_argument('--author', help='Имя пользователя.')
+        source.add_argument('--group', help='Слаг группы.')
+        parser.add_argument(
+            '--format', choices=('jsonl', 'csv'), default='jsonl',
+            dest='file_format', help='Формат файла.',
+        )
+        parser.add_argument(
+            '--output', help='Файл для выгрузки; по умолчанию stdout.')
+
+    def handle(self, *args, **options):
+        posts = self.get_posts(options['author'], options['group'])
+        lines = export_lines(export_records(posts), options['file_format'])
+        if options['output'] is None:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        with open(options['output'], 'w', encoding='utf-8',
+                  newline='') as target:
+            target.writelines(lines)
+
+    def get_posts(self, username, slug):
+        if username is not None:
+            if not User.objects.filter(username=username).exists():
+                raise CommandError(f'Пользователь {username} не найден.')
+            return Post.objects.filter(author__username=username)
+        if not Group.objects.filter(slug=slug).exists():
+            raise CommandError(f'Группа {slug} не найдена.')
+        return Post.objects.filter(group__slug=slug)
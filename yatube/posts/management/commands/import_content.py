@@ -0,0 +1,68 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from posts.importer import Importer, finish_import, read_records
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует посты, комментарии и подписки из JSONL или CSV. '
+        'Прерванный импорт продолжается с контрольной точки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл с записями.')
+        parser.add_argument(
+            '--format', choices=('jsonl', 'csv'), dest='file_format',
+            help='Формат файла; по умолчанию определяется по расширению.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.IMPORT_BATCH_SIZE,
+            help='Размер пачки bulk_create.',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=settings.IMPORT_CHUNK_SIZE,
+            help='Количество записей в одной транзакции.',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help=(
+                'Имя контрольной точки в базе; по умолчанию полный путь '
+                'к файлу.'
+            ),
+        )
+        parser.add_argument(
+            '--no-rebuild', action='store_true',
+            help='Не перестраивать счётчики, ленты и поисковый индекс.',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'Файл {path} не найден.')
+        importer = Importer(
+            source=options['checkpoint'] or os.path.abspath(path),
+            batch_size=options['batch_size'],
+            chunk_size=options['chunk_size'],
+            progress=self.report,
+        )
+        try:
+            importer.run(read_records(path, options['file_format']))
+        except (IntegrityError, ValueError) as error:
+            raise CommandError(
+                f'Импорт остановлен: {error}. Повторный запуск продолжит '
+                f'его с последней контрольной точки.'
+            ) from error
+        if not options['no_rebuild']:
+            finish_import()
+        imported = ', '.join(
+            f'{name}: {count}' for name, count in importer.imported.items())
+        self.stdout.write(self.style.SUCCESS(
+            f'Импорт завершён ({imported}), пропущено: {importer.skipped}.'))
+
+    def report(self, position, rate):
+        self.stdout.write(
+            f'Обработано записей: {position} ({rate:.0f} записей/с)')
@@ -0,0 +1,78 @@
+from concurrent.futures import (FIRST_COMPLETED, ThreadPoolExecutor,
+                                wait)
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from posts.models import Post
+from posts.thumbnails import build_manifest
+
+# Сколько постов читается за один запрос
+BATCH_SIZE = 1000
+
+
+def _build(image_name, post_ids):
+    """Манифесты постов одной картинки; миниатюры строятся один раз."""
+    try:
+        for post_id in post_ids:
+            build_manifest(post_id, image_name)
+    finally:
+        # У потоков пула собственные соединения с базой
+        connection.close()
+    return len(post_ids)
+
+
+def _images():
+    """Картинки постов без манифеста вместе с id этих постов.
+
+    Посты читаются пачками по ключу, а не одним курсором: потоки пула
+    тем временем записывают манифесты.
+    """
+    posts = Post.objects.exclude(image='').filter(
+        image_renditions='').order_by('pk').values_list('pk', 'image')
+    last_pk = 0
+    while True:
+        batch = list(posts.filter(pk__gt=last_pk)[:BATCH_SIZE])
+        if not batch:
+            return
+        last_pk = batch[-1][0]
+        by_name = {}
+        for pk, name in batch:
+            by_name.setdefault(name, []).append(pk)
+        yield from by_name.items()
+
+
+class Command(BaseCommand):
+    help = 'Строит миниатюры и манифесты для постов без манифеста.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.THUMBNAIL_WORKERS,
+            help='Количество параллельных потоков.',
+        )
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        done = 0
+        pending = set()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for name, post_ids in _images():
+                # Очередь не растёт больше двух задач на поток, иначе
+                # в память попали бы все посты без манифеста
+                if len(pending) >= workers * 2:
+                    finished, pending = wait(
+                        pending, return_when=FIRST_COMPLETED)
+                    done = self._report(done, finished)
+                pending.add(pool.submit(_build, name, post_ids))
+            done = self._report(done, wait(pending).done)
+        self.stdout.write(
+            self.style.SUCCESS(f'Манифесты построены для {done} постов.'))
+
+    def _report(self, done, finished):
+        for future in finished:
+            before = done
+            done += future.result()
+            if done // 1000 > before // 1000:
+                self.stdout.write(f'Обработано постов: {done}')
+        return done
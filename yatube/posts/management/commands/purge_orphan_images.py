@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет файлы картинок постов, на которые не ссылается ни один '
+        'пост, например оставшиеся после отката транзакции.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than', type=int, default=settings.ORPHAN_IMAGE_AGE,
+            help='Удалять только файлы старше стольких секунд.',
+        )
+
+    def handle(self, *args, **options):
+        field = Post._meta.get_field('image')
+        purged = field.storage.purge_orphans(
+            field.upload_to.rstrip('/'), options['older_than'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Удалено файлов: {len(purged)}.'))
@@ -1,20 +1,53 @@
+import json
+
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 
+from .storage import DedupStorage
+
 User = get_user_model()
 
 
+class AtomicSaveMixin:
+    """Сохраняет объект и обновляет счётчики в одной транзакции.
+
+    Счётчики меняют обработчики post_save из posts.signals.
+    """
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+class ImageBlob(models.Model):
+    """Файл картинки в DedupStorage и число постов, ссылающихся на него."""
+    name = models.CharField(max_length=255, unique=True)
+    references = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        verbose_name = 'Файл картинки'
+        verbose_name_plural = 'Файлы картинок'
+
+    def __str__(self):
+        return self.name
+
+
 class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(max_length=200, unique=True)
     description = models.TextField()
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество постов',
+    )
 
     def __str__(self):
         return self.title
 
 
-class Post(models.Model):
+class Post(AtomicSaveMixin, models.Model):
     text = models.TextField(
         verbose_name='Текст поста',
         help_text='Текст нового поста',
@@ -38,9 +71,35 @@ class Post(models.Model):
     )
     image = models.ImageField(
         upload_to='posts/',
+        storage=DedupStorage(),
         blank=True,
         verbose_name='Картинка',
     )
+    # Размеры обработанной при загрузке картинки; у импортированных
+    # картинок не заполняются
+    image_width = models.PositiveIntegerField(
+        null=True,
+        editable=False,
+        verbose_name='Ширина картинки',
+    )
+    image_height = models.PositiveIntegerField(
+        null=True,
+        editable=False,
+        verbose_name='Высота картинки',
+    )
+    # Манифест миниатюр картинки в JSON: имя -> адрес, размеры и srcset
+    # по форматам (см. posts.thumbnails)
+    image_renditions = models.TextField(
+        blank=True,
+        default='',
+        editable=False,
+        verbose_name='Миниатюры картинки',
+    )
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество комментариев',
+    )
 
     class Meta:
         ordering = ['-pub_date']
@@ -51,8 +110,13 @@ class Post(models.Model):
     def __str__(self):
         return self.text[:settings.STRING_LENGTH]
 
+    @property
+    def renditions(self):
+        """Манифест миниатюр; пустой, пока они не построены."""
+        return json.loads(self.image_renditions or '{}')
+
 
-class Comment(models.Model):
+class Comment(AtomicSaveMixin, models.Model):
     post = models.ForeignKey(
         Post,
         on_delete=models.CASCADE,
@@ -78,12 +142,18 @@ class Comment(models.Model):
         default_related_name = 'comments'
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(
+                fields=['post', '-created'],
+                name='comment_post_created_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.text[:settings.STRING_LENGTH]
 
 
-class Follow(models.Model):
+class Follow(AtomicSaveMixin, models.Model):
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -113,3 +183,108 @@ class Follow(models.Model):
 
     def __str__(self):
         return f'{self.user} подписан на {self.author}'
+
+
+class UserCounters(models.Model):
+    """Денормализованные счётчики пользователя."""
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters',
+        verbose_name='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество постов',
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество подписчиков',
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество подписок',
+    )
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self):
+        return f'Счётчики {self.user}'
+
+
+class TimelineEntry(models.Model):
+    """Пост в материализованной ленте подписок пользователя.
+
+    Дата публикации скопирована из поста, чтобы лента читалась
+    по индексу (user, pub_date) без обхода таблицы постов.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост',
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи лент'
+        constraints = (
+            models.UniqueConstraint(
+                name='unique_timeline_entry',
+                fields=('user', 'post'),
+            ),
+        )
+        indexes = (
+            models.Index(
+                name='timeline_user_date_idx',
+                fields=('user', '-pub_date'),
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.post_id} в ленте {self.user_id}'
+
+
+class ImportCheckpoint(models.Model):
+    """Позиция прерванного импорта контента.
+
+    Пишется в транзакции вместе с пачкой записей, поэтому всегда
+    указывает на последнюю зафиксированную запись.
+    """
+
+    source = models.CharField(
+        max_length=255,
+        unique=True,
+        verbose_name='Источник',
+    )
+    position = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Последняя обработанная запись',
+    )
+    imported = models.TextField(
+        default='{}',
+        verbose_name='Импортировано записей по типам (JSON)',
+    )
+    skipped = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Пропущено записей',
+    )
+
+    class Meta:
+        verbose_name = 'Контрольная точка импорта'
+        verbose_name_plural = 'Контрольные точки импорта'
+
+    def __str__(self):
+        return f'{self.source}: {self.position}'
@@ -1,8 +1,244 @@
+import base64
+import binascii
+import datetime
+import json
+import math
+
 from django.conf import settings
-from django.core.paginator import Paginator
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from .counts import get_feed_count
+
+
+class FeedPaginator(Paginator):
+    """Паджинатор, которому размер ленты передаётся готовым.
+
+    count может быть числом или функцией без аргументов.
+    """
+
+    def __init__(self, object_list, per_page, count=None):
+        super().__init__(object_list, per_page)
+        self._count = count
+
+    @cached_property
+    def count(self):
+        if self._count is None:
+            return super().count
+        if callable(self._count):
+            return self._count()
+        return self._count
+
+
+class CursorPage(Page):
+    """Страница курсорного паджинатора.
+
+    Вместо номера страницы хранит непрозрачные токены соседних страниц.
+    """
+
+    def __init__(self, object_list, paginator,
+                 next_cursor=None, previous_cursor=None):
+        super().__init__(object_list, None, paginator)
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<Cursor page of {len(self.object_list)} objects>'
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class CursorPaginator(Paginator):
+    """Keyset-паджинатор без COUNT(*) и OFFSET.
+
+    Страница выбирается условием по ключу сортировки ordering
+    (по умолчанию (pub_date, id)), поэтому глубокие страницы
+    обходятся так же дёшево, как первая.
+    """
+
+    is_cursor = True
+
+    def __init__(self, object_list, per_page,
+                 ordering=('-pub_date', '-pk')):
+        self.ordering = tuple(ordering)
+        super().__init__(object_list.order_by(*self.ordering), per_page)
+
+    def get_page(self, after=None, before=None):
+        """Возвращает страницу после токена after или перед before.
+
+        Некорректный токен приводит к первой странице.
+        """
+        if before is not None:
+            values = self.decode_cursor(before)
+            if values is not None:
+                return self._page_before(values)
+        if after is not None:
+            values = self.decode_cursor(after)
+            if values is not None:
+                return self._page_after(values)
+        return self._page_after(None)
+
+    def _page_after(self, values):
+        rows = self._fetch(values, forward=True)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        next_cursor = (
+            self.encode_cursor(self.cursor_values(rows[-1]))
+            if has_more else None
+        )
+        previous_cursor = (
+            self.encode_cursor(self.cursor_values(rows[0]))
+            if values is not None and rows else None
+        )
+        return CursorPage(rows, self, next_cursor, previous_cursor)
+
+    def _page_before(self, values):
+        rows = self._fetch(values, forward=False)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page][::-1]
+        previous_cursor = (
+            self.encode_cursor(self.cursor_values(rows[0]))
+            if has_more else None
+        )
+        next_cursor = (
+            self.encode_cursor(self.cursor_values(rows[-1]))
+            if rows else None
+        )
+        return CursorPage(rows, self, next_cursor, previous_cursor)
+
+    def _fetch(self, values, forward):
+        """Выбирает per_page + 1 объект за ключом values.
+
+        Лишний объект лишь сообщает, что за страницей есть ещё записи.
+        """
+        ordering = self.ordering
+        if not forward:
+            ordering = tuple(_reverse_field(field) for field in ordering)
+        queryset = self.object_list.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self._seek(ordering, values))
+        return list(queryset[:self.per_page + 1])
+
+    @staticmethod
+    def _seek(ordering, values):
+        """Строит условие «ключ строки идёт после values» для ordering."""
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def cursor_values(self, obj):
+        return [getattr(obj, field.lstrip('-')) for field in self.ordering]
+
+    def encode_cursor(self, values):
+        values = [
+            value.isoformat() if isinstance(value, datetime.datetime)
+            else value
+            for value in values
+        ]
+        raw = json.dumps(values, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, token):
+        try:
+            raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+            values = json.loads(raw.decode())
+        except (binascii.Error, ValueError):
+            return None
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            return None
+        result = []
+        for field, value in zip(self.ordering, values):
+            value = self._cursor_value(field.lstrip('-'), value)
+            if value is None:
+                return None
+            result.append(value)
+        return result
+
+    def _cursor_value(self, name, value):
+        """Значение из токена в типе поля или None, если оно негодно."""
+        if not _is_cursor_scalar(value):
+            return None
+        opts = self.object_list.model._meta
+        try:
+            model_field = opts.pk if name == 'pk' else opts.get_field(name)
+        except FieldDoesNotExist:
+            # Аннотации вроде rank сравниваются как числа
+            return None if isinstance(value, str) else value
+        try:
+            return model_field.to_python(value)
+        except (TypeError, ValidationError):
+            return None
+
+
+def _is_cursor_scalar(value):
+    """Годится ли значение из токена для сравнения в запросе."""
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, int):
+        # Больше не помещается в целые столбцы СУБД
+        return -2 ** 63 <= value < 2 ** 63
+    if isinstance(value, float):
+        return math.isfinite(value)
+    return isinstance(value, str)
+
+
+def page_window(page, on_each_side=2, on_ends=1):
+    """Номера страниц вокруг текущей; None обозначает пропуск."""
+    num_pages = page.paginator.num_pages
+    window_start = max(page.number - on_each_side, 1)
+    window_end = min(page.number + on_each_side, num_pages)
+    numbers = []
+    if window_start > on_ends + 2:
+        numbers.extend(range(1, on_ends + 1))
+        numbers.append(None)
+    else:
+        window_start = 1
+    numbers.extend(range(window_start, window_end + 1))
+    if window_end < num_pages - on_ends - 1:
+        numbers.append(None)
+        numbers.extend(range(num_pages - on_ends + 1, num_pages + 1))
+    else:
+        numbers.extend(range(window_end + 1, num_pages + 1))
+    return numbers
+
+
+def _reverse_field(field):
+    return field[1:] if field.startswith('-') else f'-{field}'
+
 
+def paginator(posts, request, cursor=None, feed=None,
+              ordering=('-pub_date', '-pk')):
+    """Возвращает страницу постов для запроса.
 
-def paginator(posts, request):
-    paginator = Paginator(posts, settings.POSTS_ON_PAGE)
+    При cursor=True (или CURSOR_PAGINATION в настройках) используется
+    курсорная паджинация по параметрам ?after=/?before= с порядком
+    ordering. feed — пара (лента, pk) для кешированного счётчика
+    из posts.counts.
+    """
+    if cursor is None:
+        cursor = settings.CURSOR_PAGINATION
+    if cursor:
+        return CursorPaginator(
+            posts, settings.POSTS_ON_PAGE, ordering
+        ).get_page(
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+        )
+    count = None
+    if feed is not None:
+        def count():
+            return get_feed_count(posts, *feed)
+    paginator = FeedPaginator(posts, settings.POSTS_ON_PAGE, count)
     page_number = request.GET.get('page')
     return paginator.get_page(page_number)
@@ -0,0 +1,119 @@
+"""Полнотекстовый поиск по текстам постов.
+
+На SQLite тексты индексируются в таблице FTS5 posts_post_fts, где rowid
+совпадает с id поста; индекс обновляют сигналы сохранения и удаления
+поста. Результаты упорядочены по релевантности (bm25). На других СУБД,
+где такой таблицы нет, поиск сводится к icontains по словам запроса.
+"""
+import re
+
+from django.db import connection
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+
+SEARCH_TABLE = 'posts_post_fts'
+
+# Символы, из которых состоят слова запроса; остальное отбрасывается,
+# чтобы ввод пользователя не попадал в синтаксис запроса FTS5.
+WORD_RE = re.compile(r'\w+')
+
+
+def is_supported():
+    return connection.vendor == 'sqlite'
+
+
+def index_post(post):
+    """Добавляет текст поста в индекс или обновляет его."""
+    if not is_supported():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [post.pk])
+        cursor.execute(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, text) VALUES (%s, %s)',
+            [post.pk, post.text],
+        )
+
+
+def unindex_post(post_id):
+    if not is_supported():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [post_id])
+
+
+def rebuild_index():
+    """Заново заполняет индекс текстами всех постов."""
+    if not is_supported():
+        return
+    table = Post._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, text) '
+            f'SELECT id, text FROM {table}'
+        )
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) "
+            f"VALUES ('optimize')"
+        )
+
+
+def parse_query(query):
+    """Слова запроса без повторов, в нижнем регистре."""
+    return list(dict.fromkeys(
+        word.lower() for word in WORD_RE.findall(query or '')))
+
+
+def match_expression(words):
+    # Каждое слово в кавычках ищется как префикс, все слова обязательны
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def _zero_rank(queryset, ranked):
+    if not ranked:
+        return queryset
+    return queryset.annotate(rank=Value(0.0, output_field=FloatField()))
+
+
+def search_posts(queryset, query, ranked=True):
+    """Посты queryset, подходящие под query.
+
+    При ranked=True посты получают релевантность rank: чем она меньше,
+    тем выше пост в выдаче. Без неё запрос проще и годится для подсчёта
+    результатов, например в админке.
+    """
+    words = parse_query(query)
+    if not words:
+        # Выдача пустого запроса пуста, но сортируется по rank, как любая
+        return _zero_rank(queryset.none(), ranked)
+    if not is_supported():
+        condition = Q()
+        for word in words:
+            condition &= Q(text__icontains=word)
+        return _zero_rank(queryset.filter(condition), ranked)
+    expression = match_expression(words)
+    table = Post._meta.db_table
+    if not ranked:
+        # pk__in=RawSQL(...) взял бы подзапрос в двойные скобки, и SQLite
+        # сравнивал бы id только с первой найденной строкой.
+        return queryset.extra(
+            where=[
+                f'{table}.id IN (SELECT rowid FROM {SEARCH_TABLE} '
+                f'WHERE {SEARCH_TABLE} MATCH %s)',
+            ],
+            params=[expression],
+        )
+    return queryset.extra(
+        tables=[SEARCH_TABLE],
+        where=[
+            f'{SEARCH_TABLE}.rowid = {table}.id',
+            f'{SEARCH_TABLE} MATCH %s',
+        ],
+        params=[expression],
+    ).annotate(
+        rank=RawSQL(f'bm25({SEARCH_TABLE})', (), output_field=FloatField()),
+    )
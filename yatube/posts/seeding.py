@@ -0,0 +1,157 @@
+"""Генерация синтетических данных для нагрузочных замеров.
+
+Распределения неравномерны, как на живом сайте: популярность авторов
+и групп подчиняется степенному закону (веса Парето), поэтому у немногих
+авторов тысячи подписчиков, а у большинства — единицы; комментарии
+так же сосредоточены на немногих постах.
+"""
+import random
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+from faker import Faker
+
+from .importer import finish_import, keep_source_dates
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Показатель распределения Парето: чем меньше, тем сильнее перекос
+PARETO_ALPHA = 1.2
+# Доля постов без группы
+NO_GROUP_SHARE = 0.3
+# Глубина истории публикаций
+HISTORY = timedelta(days=365)
+
+
+def pareto_weights(count, rng):
+    return [rng.paretovariate(PARETO_ALPHA) for _ in range(count)]
+
+
+class Seeder:
+    """Создаёт пользователей, группы, посты, комментарии и подписки."""
+
+    def __init__(self, seed=None, batch_size=1000, progress=None):
+        self.rng = random.Random(seed)
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(seed)
+        self.batch_size = batch_size
+        self.progress = progress
+        self.now = timezone.now()
+
+    def report(self, message):
+        if self.progress is not None:
+            self.progress(message)
+
+    def run(self, users, groups, posts, comments, follows):
+        with keep_source_dates():
+            user_ids = self.create_users(users)
+            group_ids = self.create_groups(groups)
+            # Одни и те же авторы и пишут больше, и читаются чаще
+            popularity = pareto_weights(len(user_ids), self.rng)
+            post_ids = self.create_posts(
+                posts, user_ids, popularity, group_ids)
+            self.create_comments(comments, user_ids, post_ids)
+            self.create_follows(follows, user_ids, popularity)
+        self.report('Перестройка счётчиков, лент и индекса')
+        finish_import()
+
+    def batches(self, model, objects, **kwargs):
+        """Вставляет объекты генератора пачками по batch_size."""
+        batch = []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) >= self.batch_size:
+                model.objects.bulk_create(batch, **kwargs)
+                batch = []
+        if batch:
+            model.objects.bulk_create(batch, **kwargs)
+
+    def random_date(self):
+        return self.now - HISTORY * self.rng.random()
+
+    def create_users(self, count):
+        # Хеш пароля дорогой, поэтому он один на всех
+        password = make_password('password')
+        first = User.objects.count()
+        self.batches(User, (
+            User(
+                username=f'user{first + number}',
+                first_name=self.fake.first_name(),
+                last_name=self.fake.last_name(),
+                password=password,
+            )
+            for number in range(count)
+        ))
+        self.report(f'Пользователей: {count}')
+        return list(User.objects.values_list('pk', flat=True))
+
+    def create_groups(self, count):
+        first = Group.objects.count()
+        self.batches(Group, (
+            Group(
+                title=self.fake.catch_phrase()[:200],
+                slug=f'group-{first + number}',
+                description=self.fake.paragraph(),
+            )
+            for number in range(count)
+        ))
+        self.report(f'Групп: {count}')
+        return list(Group.objects.values_list('pk', flat=True))
+
+    def create_posts(self, count, user_ids, popularity, group_ids):
+        authors = self.rng.choices(user_ids, popularity, k=count)
+        group_weights = pareto_weights(len(group_ids), self.rng)
+        groups = (
+            self.rng.choices(group_ids, group_weights, k=count)
+            if group_ids else [None] * count
+        )
+        with transaction.atomic():
+            self.batches(Post, (
+                Post(
+                    author_id=author_id,
+                    group_id=(
+                        None if self.rng.random() < NO_GROUP_SHARE
+                        else group_id
+                    ),
+                    text=self.fake.text(self.rng.randint(50, 1000)),
+                    pub_date=self.random_date(),
+                )
+                for author_id, group_id in zip(authors, groups)
+            ))
+        self.report(f'Постов: {count}')
+        return list(Post.objects.values_list('pk', flat=True))
+
+    def create_comments(self, count, user_ids, post_ids):
+        if not post_ids:
+            return
+        posts = self.rng.choices(
+            post_ids, pareto_weights(len(post_ids), self.rng), k=count)
+        with transaction.atomic():
+            self.batches(Comment, (
+                Comment(
+                    post_id=post_id,
+                    author_id=self.rng.choice(user_ids),
+                    text=self.fake.sentence(),
+                    created=self.random_date(),
+                )
+                for post_id in posts
+            ))
+        self.report(f'Комментариев: {count}')
+
+    def create_follows(self, count, user_ids, popularity):
+        if len(user_ids) < 2:
+            return
+        authors = self.rng.choices(user_ids, popularity, k=count)
+        pairs = {
+            (self.rng.choice(user_ids), author_id) for author_id in authors
+        }
+        with transaction.atomic():
+            self.batches(Follow, (
+                Follow(user_id=user_id, author_id=author_id)
+                for user_id, author_id in pairs if user_id != author_id
+            ), ignore_conflicts=True)
+        self.report(f'Подписок: не больше {count}')
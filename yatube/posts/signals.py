@@ -0,0 +1,183 @@
+from django.db.models.signals import (post_delete, post_init, post_save,
+                                      pre_save)
+from django.db import transaction
+from django.dispatch import receiver
+
+from core.caching import bump_generation
+
+from . import search, thumbnails, timeline, transforms
+from .counts import invalidate_follow_feed, invalidate_post_feeds
+from .models import Comment, Follow, Group, Post, User, UserCounters
+from .stats import change_counter
+from .versions import (ALL_POSTS, GROUPS, author_scope, bump_post,
+                       group_scope, post_scope)
+
+
+@receiver(post_init, sender=User)
+def remember_username(sender, instance, **kwargs):
+    """Запоминает имя, чтобы при переименовании сбросить и старый профиль."""
+    instance._loaded_username = instance.__dict__.get('username')
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw, update_fields, **kwargs):
+    if raw:
+        return
+    if created:
+        UserCounters.objects.get_or_create(user=instance)
+    # Вход в систему меняет только last_login, который нигде не виден
+    if update_fields != frozenset({'last_login'}):
+        _bump_author_scopes(instance)
+    instance._loaded_username = instance.username
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    _bump_author_scopes(instance)
+
+
+def _bump_author_scopes(user):
+    usernames = {user._loaded_username, user.username} - {None}
+    bump_generation(*(author_scope(username) for username in usernames))
+
+
+@receiver(post_init, sender=Group)
+def remember_group_slug(sender, instance, **kwargs):
+    """Запоминает адрес, чтобы при его смене сбросить и старую страницу."""
+    instance._loaded_slug = instance.__dict__.get('slug')
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    slugs = {instance._loaded_slug, instance.slug} - {None}
+    bump_generation(
+        ALL_POSTS, GROUPS, *(group_scope(slug) for slug in slugs))
+    instance._loaded_slug = instance.slug
+
+
+@receiver(post_init, sender=Post)
+def remember_post_state(sender, instance, **kwargs):
+    """Запоминает группу и картинку, чтобы учесть их смену при сохранении."""
+    instance._loaded_group_id = instance.__dict__.get('group_id')
+    instance._loaded_image = str(instance.__dict__.get('image') or '')
+
+
+@receiver(pre_save, sender=Post)
+def reset_renditions(sender, instance, raw, **kwargs):
+    """Сбрасывает манифест миниатюр прежней картинки."""
+    if instance._state.adding:
+        # Картинка из конструктора нового поста тоже считается сменой
+        instance._loaded_image = ''
+    if not raw and (instance.image.name or '') != instance._loaded_image:
+        instance.image_renditions = ''
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw, **kwargs):
+    old_group_id = instance._loaded_group_id
+    invalidate_post_feeds(
+        instance.author_id,
+        {old_group_id, instance.group_id},
+    )
+    bump_post(instance, {old_group_id, instance.group_id})
+    search.index_post(instance)
+    image_name = instance.image.name or ''
+    if image_name != instance._loaded_image:
+        if image_name:
+            instance.image.storage.acquire(image_name)
+        thumbnails.schedule(instance.pk, image_name)
+        _release_image(instance._loaded_image)
+        instance._loaded_image = image_name
+    instance._loaded_group_id = instance.group_id
+    if raw:
+        return
+    if created:
+        change_counter(
+            UserCounters.objects.filter(user=instance.author_id),
+            'posts_count', 1,
+        )
+        timeline.fan_out(instance)
+    elif old_group_id == instance.group_id:
+        return
+    elif old_group_id is not None:
+        change_counter(
+            Group.objects.filter(pk=old_group_id), 'posts_count', -1)
+    if instance.group_id is not None:
+        change_counter(
+            Group.objects.filter(pk=instance.group_id), 'posts_count', 1)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    invalidate_post_feeds(instance.author_id, {instance.group_id})
+    timeline.forget_recent_posts(instance.author_id)
+    bump_post(instance, {instance.group_id})
+    search.unindex_post(instance.pk)
+    _release_image(instance.image.name)
+    change_counter(
+        UserCounters.objects.filter(user=instance.author_id),
+        'posts_count', -1,
+    )
+    if instance.group_id is not None:
+        change_counter(
+            Group.objects.filter(pk=instance.group_id), 'posts_count', -1)
+
+
+def _release_image(image_name):
+    """Снимает ссылку поста на файл картинки после фиксации транзакции."""
+    if not image_name:
+        return
+    storage = Post._meta.get_field('image').storage
+
+    def release():
+        if storage.release(image_name):
+            thumbnails.forget(image_name)
+            transforms.purge(image_name)
+    transaction.on_commit(release)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw, **kwargs):
+    bump_generation(post_scope(instance.post_id))
+    if created and not raw:
+        change_counter(
+            Post.objects.filter(pk=instance.post_id), 'comments_count', 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    bump_generation(post_scope(instance.post_id))
+    change_counter(
+        Post.objects.filter(pk=instance.post_id), 'comments_count', -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, raw, **kwargs):
+    invalidate_follow_feed(instance.user_id)
+    if created and not raw:
+        _change_follow_counters(instance, 1)
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    invalidate_follow_feed(instance.user_id)
+    _change_follow_counters(instance, -1)
+    timeline.prune(instance.user_id, instance.author_id)
+    timeline.settle(instance.author_id)
+
+
+def _change_follow_counters(follow, delta):
+    bump_generation(
+        author_scope(follow.author.username),
+        author_scope(follow.user.username),
+    )
+    change_counter(
+        UserCounters.objects.filter(user=follow.author_id),
+        'followers_count', delta,
+    )
+    change_counter(
+        UserCounters.objects.filter(user=follow.user_id),
+        'following_count', delta,
+    )
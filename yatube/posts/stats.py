@@ -0,0 +1,51 @@
+"""Денормализованные счётчики постов, комментариев и подписок.
+
+Сигналы из posts.signals меняют счётчики на единицу, а rebuild_counters
+пересчитывает их целиком по базе (команда rebuild_counters).
+"""
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Follow, Group, Post, User, UserCounters
+
+
+def change_counter(queryset, field, delta):
+    """Атомарно сдвигает счётчик field у объектов queryset на delta."""
+    value = F(field) + delta
+    if delta < 0:
+        value = Greatest(value, 0)
+    queryset.update(**{field: value})
+
+
+def _count(queryset, field):
+    """Подзапрос с числом строк queryset, ссылающихся на внешний pk."""
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def rebuild_counters():
+    """Пересчитывает все счётчики по фактическим данным."""
+    UserCounters.objects.bulk_create(
+        [
+            UserCounters(user_id=pk)
+            for pk in User.objects.filter(
+                counters__isnull=True).values_list('pk', flat=True)
+        ],
+        ignore_conflicts=True,
+    )
+    Group.objects.update(posts_count=_count(Post.objects, 'group'))
+    Post.objects.update(comments_count=_count(Comment.objects, 'post'))
+    UserCounters.objects.update(
+        posts_count=_count(Post.objects, 'author'),
+        followers_count=_count(Follow.objects, 'author'),
+        following_count=_count(Follow.objects, 'user'),
+    )
@@ -0,0 +1,161 @@
+"""Хранилище картинок постов с адресацией по содержимому.
+
+Одна и та же картинка загружается многократно, поэтому файл хранится
+под SHA-256 своего содержимого: posts/ab/ab12…ef.jpg. Хеш считается
+по частям при записи во временный файл, так что загрузка не читается
+в память целиком. Повторная загрузка не создаёт нового файла.
+
+Ссылки на файл считает ImageBlob: сигнал post_save поста добавляет
+ссылку (acquire) при каждой смене имени картинки в той же транзакции,
+а после фиксации снимает ссылку со старого имени; release (и delete)
+удаляет файл вместе с последней ссылкой. Файл, записанный транзакцией,
+которая затем откатилась, остаётся без ссылок — его убирает
+purge_orphans. Миниатюры строятся по имени исходника и потому общие
+у всех копий.
+"""
+import hashlib
+import os
+import posixpath
+import tempfile
+import time
+
+from django.apps import apps
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+
+def _blobs():
+    # Модель берётся из реестра: models.py сам импортирует хранилище
+    return apps.get_model('posts', 'ImageBlob').objects
+
+
+@deconstructible
+class DedupStorage(FileSystemStorage):
+    """Файловое хранилище, где каждое содержимое лежит один раз."""
+
+    def get_available_name(self, name, max_length=None):
+        # Настоящее имя известно только после хеширования в _save
+        return name
+
+    def _save(self, name, content):
+        directory = posixpath.dirname(name)
+        extension = posixpath.splitext(name)[1].lower()
+        os.makedirs(self.path(directory), exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(
+            dir=self.path(directory), suffix='.upload')
+        digest = hashlib.sha256()
+        try:
+            with os.fdopen(descriptor, 'wb') as target:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    target.write(chunk)
+            hexdigest = digest.hexdigest()
+            name = posixpath.join(
+                directory, hexdigest[:2], hexdigest + extension)
+            path = self.path(name)
+            if os.path.exists(path):
+                os.remove(temporary)
+                # Свежее время изменения защищает файл от purge_orphans,
+                # пока ссылка на него ещё не зафиксирована
+                os.utime(path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(temporary, path)
+                if self.file_permissions_mode is not None:
+                    os.chmod(path, self.file_permissions_mode)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        return name
+
+    def acquire(self, name):
+        """Добавляет ссылку на файл name.
+
+        Первая ссылка учитывает все посты с этой картинкой: имя могло
+        попасть в базу в обход сигналов (импорт, update()). Имена вне
+        каталога хранилища не учитываются.
+        """
+        try:
+            self.path(name)
+        except SuspiciousFileOperation:
+            return
+        with transaction.atomic():
+            updated = _blobs().filter(name=name).update(
+                references=F('references') + 1)
+            if not updated:
+                references = apps.get_model('posts', 'Post').objects.filter(
+                    image=name).count()
+                _blobs().get_or_create(
+                    name=name,
+                    defaults={'references': max(references, 1)},
+                )
+
+    def release(self, name):
+        """Снимает ссылку на файл и удаляет его вместе с последней.
+
+        Возвращает True, если файл удалён. Файлы без учёта ссылок
+        (загруженные до этого хранилища или импортированные)
+        не удаляются.
+        """
+        with transaction.atomic():
+            blob = _blobs().select_for_update().filter(name=name).first()
+            if blob is None:
+                return False
+            if blob.references > 1:
+                _blobs().filter(pk=blob.pk).update(
+                    references=F('references') - 1)
+                return False
+            blob.delete()
+            super().delete(name)
+        return True
+
+    def delete(self, name):
+        self.release(name)
+
+    def purge_orphans(self, directory, older_than, batch_size=500):
+        """Удаляет файлы directory без ссылок старше older_than секунд.
+
+        Сюда попадают файлы откатившихся транзакций и брошенные
+        временные файлы загрузок. Возвращает имена удалённых файлов.
+        """
+        if not self.exists(directory):
+            return []
+        deadline = time.time() - older_than
+        candidates = [
+            name for name in self._walk(directory)
+            if os.path.getmtime(self.path(name)) < deadline
+        ]
+        purged = []
+        for start in range(0, len(candidates), batch_size):
+            batch = candidates[start:start + batch_size]
+            used = _used_names(batch)
+            for name in batch:
+                path = self.path(name)
+                # Повторная загрузка того же файла обновляет его время
+                if name in used or os.path.getmtime(path) >= deadline:
+                    continue
+                os.remove(path)
+                purged.append(name)
+        return purged
+
+    def _walk(self, directory):
+        subdirectories, files = self.listdir(directory)
+        for name in files:
+            yield posixpath.join(directory, name)
+        for subdirectory in subdirectories:
+            yield from self._walk(posixpath.join(directory, subdirectory))
+
+
+def _used_names(names):
+    """Имена из names, на которые есть ссылки или посты."""
+    used = set(
+        _blobs().filter(name__in=names).values_list('name', flat=True))
+    used.update(
+        apps.get_model('posts', 'Post').objects.filter(
+            image__in=names).values_list('image', flat=True)
+    )
+    return used
@@ -0,0 +1,23 @@
+from django import template
+
+from .. import paginators
+
+register = template.Library()
+
+
+@register.filter
+def page_window(page):
+    return paginators.page_window(page)
+
+
+@register.simple_tag(takes_context=True)
+def page_query(context, **params):
+    """Строка запроса соседней страницы с сохранением остальных параметров.
+
+    Прежние параметры паджинации отбрасываются, params их заменяют.
+    """
+    query = context['request'].GET.copy()
+    for name in ('page', 'after', 'before'):
+        query.pop(name, None)
+    query.update(params)
+    return f'?{query.urlencode()}'
@@ -0,0 +1,33 @@
+from django import template
+from django.urls import reverse
+
+from .. import thumbnails, transforms
+
+register = template.Library()
+
+
+@register.filter
+def rendition(post, name):
+    """Данные миниатюры name картинки поста: url, width, height, sources.
+
+    Берёт манифест поста или данные, заранее проставленные
+    attach_thumbnails, и только при их отсутствии обращается к кешу сам.
+    """
+    if not post.image:
+        return None
+    ready = post.renditions or getattr(post, 'thumbnails', None) or {}
+    if name in ready:
+        return ready[name]
+    return thumbnails.get_rendition(post.image.name, name)
+
+
+@register.simple_tag
+def transform_url(image, width, height, crop=True, image_format='jpeg'):
+    """Адрес картинки image в размере width×height, строится по запросу.
+
+    Пример: {% transform_url post.image 480 320 image_format='webp' %}
+    """
+    if not image:
+        return ''
+    return reverse('posts:image_transform', args=[
+        transforms.sign(image.name, width, height, crop, image_format)])
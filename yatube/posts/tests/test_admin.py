@@ -0,0 +1,67 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class PostAdminTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        cls.groups = [
+            Group.objects.create(
+                title=f'Группа {number}', slug=f'group_{number}',
+                description='Описание')
+            for number in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def changelist_queries(self):
+        url = reverse('admin:posts_post_changelist')
+        # Первый запрос заполняет кеш списка групп и счётчика постов
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def create_posts(self, count):
+        for number in range(count):
+            Post.objects.create(
+                author=self.admin,
+                group=self.groups[number % len(self.groups)],
+                text=f'Пост {number}',
+            )
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        """Число запросов списка постов не зависит от числа строк."""
+        self.create_posts(2)
+        few = self.changelist_queries()
+        self.create_posts(20)
+        self.assertEqual(self.changelist_queries(), few)
+        response = self.client.get(reverse('admin:posts_post_changelist'))
+        self.assertContains(
+            response,
+            f'<option value="{self.groups[0].pk}" selected>Группа 0</option>',
+        )
+
+    def test_group_choices_follow_group_changes(self):
+        """Кешированный список групп обновляется после правки группы."""
+        self.create_posts(1)
+        url = reverse('admin:posts_post_changelist')
+        self.client.get(url)
+        Group.objects.create(
+            title='Новая группа', slug='new_group', description='Описание')
+        self.assertContains(self.client.get(url), 'Новая группа')
@@ -0,0 +1,52 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import Comment, Follow, Group, Post, User, UserCounters
+
+
+class SeedAndBenchmarkTests(TestCase):
+    def test_seed_data(self):
+        """Генератор создаёт данные и заполняет счётчики."""
+        call_command(
+            'seed_data', '--users=20', '--groups=3', '--posts=60',
+            '--comments=40', '--follows=30', '--seed=1', stdout=StringIO(),
+        )
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 60)
+        self.assertEqual(Comment.objects.count(), 40)
+        self.assertTrue(Follow.objects.exists())
+        self.assertEqual(
+            sum(UserCounters.objects.values_list('posts_count', flat=True)),
+            60,
+        )
+
+    def test_benchmark_views(self):
+        """Замер пишет статистику каждой страницы в JSON."""
+        call_command(
+            'seed_data', '--users=5', '--groups=2', '--posts=15',
+            '--comments=5', '--follows=5', '--seed=2', stdout=StringIO(),
+        )
+        path = os.path.join(tempfile.mkdtemp(), 'result.json')
+        call_command(
+            'benchmark_views', '--requests=3', '--cold', f'--output={path}',
+            stdout=StringIO(),
+        )
+        with open(path, encoding='utf-8') as source:
+            results = json.load(source)['results']
+        os.remove(path)
+        self.assertEqual(
+            {result['view'] for result in results},
+            {'index', 'group_posts', 'profile', 'post_detail',
+             'follow_index'},
+        )
+        for result in results:
+            with self.subTest(view=result['view']):
+                self.assertEqual(result['status'], 200)
+                self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+                self.assertGreater(result['bytes_avg'], 0)
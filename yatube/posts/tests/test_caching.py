@@ -0,0 +1,153 @@
+from http import HTTPStatus
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core import caching
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class PageCacheInvalidationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, group=cls.group, text='Первый пост')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_pages_are_cached_until_write(self):
+        """Страницы кешируются и сбрасываются новым постом."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': 'auth'}),
+        )
+        for url in urls:
+            self.client.get(url)
+        for url in urls:
+            with self.subTest(url=url), self.assertNumQueries(0):
+                self.client.get(url)
+        Post.objects.create(
+            author=self.user, group=self.group, text='Свежий пост')
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), 'Свежий пост')
+
+    def test_comment_invalidates_post_detail(self):
+        """Новый комментарий сбрасывает кеш страницы поста."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        self.client.get(url)
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Свежий комментарий')
+        self.assertContains(self.client.get(url), 'Свежий комментарий')
+
+    def test_renames_invalidate_old_addresses(self):
+        """Смена адреса группы и имени автора сбрасывает старые страницы."""
+        group = Group.objects.create(title='Группа', slug='old_slug')
+        author = User.objects.create_user(username='old_name')
+        group_url = reverse('posts:group_list', kwargs={'slug': 'old_slug'})
+        profile_url = reverse(
+            'posts:profile', kwargs={'username': 'old_name'})
+        for url in (group_url, profile_url):
+            self.assertEqual(self.client.get(url).status_code, HTTPStatus.OK)
+        group = Group.objects.get(pk=group.pk)
+        group.slug = 'new_slug'
+        group.save()
+        author = User.objects.get(pk=author.pk)
+        author.username = 'new_name'
+        author.save()
+        for url in (group_url, profile_url):
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.client.get(url).status_code, HTTPStatus.NOT_FOUND)
+
+    def test_deleted_author_profile_is_invalidated(self):
+        """Удаление автора сбрасывает кеш его профиля."""
+        author = User.objects.create_user(username='leaving')
+        url = reverse('posts:profile', kwargs={'username': 'leaving'})
+        self.assertEqual(self.client.get(url).status_code, HTTPStatus.OK)
+        User.objects.get(pk=author.pk).delete()
+        self.assertEqual(
+            self.client.get(url).status_code, HTTPStatus.NOT_FOUND)
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.user, text='Первый пост')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_unchanged_pages_return_304(self):
+        """Повторный запрос с ETag получает 304 без запросов к базе."""
+        client = Client()
+        client.force_login(self.reader)
+        # Остаются запросы сессии и пользователя, а для поста ещё
+        # имя автора для его областей
+        urls = {
+            reverse('posts:index'): 2,
+            reverse('posts:profile', kwargs={'username': 'auth'}): 2,
+            reverse(
+                'posts:post_detail', kwargs={'post_id': self.post.pk}): 3,
+            reverse('posts:follow_index'): 2,
+        }
+        for url, queries in urls.items():
+            # Первый ответ страницы с формой выставляет CSRF-cookie,
+            # от которой зависит ETag
+            client.get(url)
+            etag = client.get(url)['ETag']
+            with self.subTest(url=url):
+                with self.assertNumQueries(queries):
+                    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+
+    def test_follow_changes_etag(self):
+        """Подписка меняет ETag ленты подписок."""
+        client = Client()
+        client.force_login(self.reader)
+        url = reverse('posts:follow_index')
+        etag = client.get(url)['ETag']
+        Follow.objects.create(user=self.reader, author=self.user)
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Первый пост')
+
+    def test_new_csrf_cookie_changes_etag(self):
+        """Страница с формой перерисовывается после смены CSRF-cookie."""
+        client = Client()
+        client.force_login(self.reader)
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        client.get(url)
+        etag = client.get(url)['ETag']
+        client.cookies[settings.CSRF_COOKIE_NAME] = 'x' * 64
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_generations_read_once_per_request(self):
+        """ETag и кеш страницы читают поколения одним обращением."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        with mock.patch.object(
+            caching, 'get_generations', wraps=caching.get_generations
+        ) as get_generations:
+            Client().get(url)
+        get_generations.assert_called_once()
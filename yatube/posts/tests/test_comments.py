@@ -0,0 +1,52 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Post
+
+User = get_user_model()
+
+
+@override_settings(COMMENTS_ON_PAGE=2)
+class CommentPagesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+        for number in range(5):
+            Comment.objects.create(
+                post=cls.post, author=cls.user, text=f'Комментарий {number}')
+        cls.expected = list(
+            cls.post.comments.order_by('-created', '-pk').values_list(
+                'text', flat=True)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_comments_are_loaded_by_pages(self):
+        """Пост показывает первую страницу, остальные подгружаются."""
+        response = Client().get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+        page = response.context['comments']
+        texts = [comment.text for comment in page]
+        self.assertContains(response, 'Комментариев:  <span >5</span>')
+        while page.has_next():
+            response = Client().get(
+                reverse('posts:post_comments',
+                        kwargs={'post_id': self.post.pk}),
+                {'after': page.next_cursor},
+            )
+            self.assertTemplateUsed(response, 'posts/includes/comments.html')
+            page = response.context['comments']
+            texts.extend(comment.text for comment in page)
+        self.assertEqual(texts, self.expected)
+
+    def test_new_comment_refreshes_fragment(self):
+        """Новый комментарий виден в подгружаемой странице."""
+        url = reverse('posts:post_comments', kwargs={'post_id': self.post.pk})
+        Client().get(url)
+        Comment.objects.create(post=self.post, author=self.user, text='Новый')
+        self.assertContains(Client().get(url), 'Новый')
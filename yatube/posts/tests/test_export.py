@@ -0,0 +1,67 @@
+import csv
+import json
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, group=cls.group, text='Пост с картинкой',
+            image='posts/picture.png')
+        Post.objects.create(author=cls.user, text='Пост без группы')
+        Comment.objects.create(post=cls.post, author=cls.user, text='Ок')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def read(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_profile_export_jsonl(self):
+        """Выгрузка профиля отдаёт все посты построчно в JSONL."""
+        response = self.client.get(
+            reverse('posts:profile_export', kwargs={'username': 'auth'}))
+        self.assertTrue(response.streaming)
+        records = [json.loads(line) for line in self.read(response).split(
+            '\n') if line]
+        self.assertEqual(len(records), 2)
+        exported = next(
+            record for record in records if record['id'] == self.post.pk)
+        self.assertEqual(exported['comments_count'], 1)
+        self.assertEqual(exported['group'], 'test_slug')
+        self.assertEqual(
+            exported['image_url'], 'http://testserver/media/posts/picture.png')
+
+    def test_group_export_csv(self):
+        """Выгрузка группы в CSV содержит заголовок и посты группы."""
+        response = self.client.get(
+            reverse('posts:group_export', kwargs={'slug': 'test_slug'}),
+            {'format': 'csv'},
+        )
+        self.assertIn('group-test_slug.csv', response['Content-Disposition'])
+        rows = list(csv.DictReader(StringIO(self.read(response))))
+        self.assertEqual([row['text'] for row in rows], ['Пост с картинкой'])
+
+    def test_export_command(self):
+        """Команда выгружает посты автора."""
+        out = StringIO()
+        call_command('export_posts', '--author=auth', stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 2)
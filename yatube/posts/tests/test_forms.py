@@ -1,3 +1,4 @@
+import hashlib
 import shutil
 import tempfile
 
@@ -64,11 +65,12 @@ class PostFormTests(TestCase):
         )
         self.assertEqual(response.status_code, HTTPStatus.OK)
         post = Post.objects.last()
+        digest = hashlib.sha256(self.small_gif).hexdigest()
         check_post_fields = (
             (post.author, self.user),
             (post.text, form_data['text']),
             (post.group.id, form_data['group']),
-            (post.image, 'posts/small.gif'),
+            (post.image, f'posts/{digest[:2]}/{digest}.gif'),
         )
         for new_post, expected in check_post_fields:
             with self.subTest(new_post=new_post):
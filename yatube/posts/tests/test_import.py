@@ -0,0 +1,149 @@
+import csv
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import (Comment, Follow, Group, ImportCheckpoint, Post,
+                      TimelineEntry, UserCounters)
+
+User = get_user_model()
+
+RECORDS = [
+    {'type': 'post', 'id': 100, 'author': 'auth', 'group': 'test_slug',
+     'text': 'Импортированный пост', 'pub_date': '2020-01-02T03:04:05'},
+    {'type': 'post', 'id': 101, 'author': 'auth', 'text': 'Второй пост'},
+    {'type': 'comment', 'post': 100, 'author': 'reader',
+     'text': 'Комментарий', 'created': '2020-01-03T00:00:00'},
+    {'type': 'follow', 'user': 'reader', 'author': 'auth'},
+    {'type': 'post', 'author': 'nobody', 'text': 'Неизвестный автор'},
+]
+
+
+class ImportContentTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'content.jsonl')
+        with open(self.path, 'w', encoding='utf-8') as target:
+            for record in RECORDS:
+                target.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def import_content(self, *args):
+        out = StringIO()
+        with self.assertLogs('posts.importer', 'WARNING') as logs:
+            call_command(
+                'import_content', self.path, '--chunk-size=2', *args,
+                stdout=out)
+        self.assertIn('Запись 5 пропущена', '\n'.join(logs.output))
+        return out.getvalue()
+
+    def test_import(self):
+        """Импорт сохраняет даты и перестраивает счётчики и ленты."""
+        output = self.import_content()
+        self.assertIn('пропущено: 1', output)
+        self.assertIn('Обработано записей: 2', output)
+        post = Post.objects.get(pk=100)
+        self.assertEqual(post.group, self.group)
+        self.assertEqual(post.pub_date.year, 2020)
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(Comment.objects.get().created.day, 3)
+        self.assertTrue(
+            Follow.objects.filter(user=self.reader, author=self.user).exists())
+        self.assertEqual(
+            UserCounters.objects.get(user=self.user).posts_count, 2)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 2)
+        self.assertFalse(ImportCheckpoint.objects.exists())
+
+    def test_resume_from_checkpoint(self):
+        """Повторный запуск продолжает с контрольной точки."""
+        ImportCheckpoint.objects.create(
+            source=self.path,
+            position=2,
+            imported=json.dumps({'post': 2, 'comment': 0, 'follow': 0}),
+        )
+        Post.objects.bulk_create([
+            Post(pk=100, author=self.user, text='Уже импортирован'),
+            Post(pk=101, author=self.user, text='Уже импортирован'),
+        ])
+        output = self.import_content('--no-rebuild')
+        self.assertIn('post: 2, comment: 1, follow: 1', output)
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(Post.objects.get(pk=100).text, 'Уже импортирован')
+
+    def test_invalid_and_repeated_records_are_skipped(self):
+        """Дубли и комментарии к несуществующим постам не ломают импорт."""
+        Post.objects.bulk_create(
+            [Post(pk=100, author=self.user, text='Уже есть')])
+        with open(self.path, 'a', encoding='utf-8') as target:
+            for record in (
+                {'type': 'comment', 'post': 999, 'author': 'reader',
+                 'text': 'К несуществующему посту'},
+                {'type': 'follow', 'user': 'reader', 'author': 'auth'},
+            ):
+                target.write(json.dumps(record, ensure_ascii=False) + '\n')
+        output = self.import_content('--no-rebuild')
+        self.assertIn(
+            'post: 1, comment: 1, follow: 1), пропущено: 4', output)
+        self.assertEqual(Post.objects.get(pk=100).text, 'Уже есть')
+        self.assertEqual(Comment.objects.get().post_id, 100)
+        self.assertEqual(Follow.objects.count(), 1)
+
+    def test_malformed_lines_are_skipped(self):
+        """Испорченные строки JSONL пропускаются, а не прерывают импорт."""
+        with open(self.path, 'a', encoding='utf-8') as target:
+            target.write('{"type": "post", "author": \n')
+            target.write('null\n[1, 2]\n"пост"\n')
+            target.write(
+                '{"type": "comment", "post": null, "author": "reader", '
+                '"text": "Без поста"}\n')
+            target.write(
+                '{"type": "post", "author": ["auth"], "text": "Список"}\n')
+        output = self.import_content('--no-rebuild')
+        self.assertIn(
+            'post: 2, comment: 1, follow: 1), пропущено: 7', output)
+        self.assertFalse(ImportCheckpoint.objects.exists())
+
+    def test_csv_ids_are_compared_as_numbers(self):
+        """Занятые id из CSV пропускаются, как и в JSONL."""
+        Post.objects.bulk_create(
+            [Post(pk=100, author=self.user, text='Уже есть')])
+        path = os.path.join(self.directory, 'content.csv')
+        with open(path, 'w', encoding='utf-8', newline='') as target:
+            writer = csv.DictWriter(
+                target, ['type', 'id', 'author', 'text'])
+            writer.writeheader()
+            writer.writerow(
+                {'type': 'post', 'id': '100', 'author': 'auth',
+                 'text': 'Дубль'})
+            writer.writerow(
+                {'type': 'post', 'id': '102', 'author': 'auth',
+                 'text': 'Новый'})
+            writer.writerow(
+                {'type': 'post', 'id': '102', 'author': 'auth',
+                 'text': 'Повтор'})
+        out = StringIO()
+        with self.assertLogs('posts.importer', 'WARNING'):
+            call_command('import_content', path, '--no-rebuild', stdout=out)
+        self.assertIn('пропущено: 2', out.getvalue())
+        self.assertEqual(Post.objects.get(pk=100).text, 'Уже есть')
+        self.assertEqual(Post.objects.get(pk=102).text, 'Новый')
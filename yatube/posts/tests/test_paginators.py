@@ -0,0 +1,161 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..counts import feed_count_key, get_feed_count
+from ..models import Group, Post
+from ..paginators import CursorPaginator, FeedPaginator, page_window
+
+User = get_user_model()
+
+
+class CursorPaginatorTests(TestCase):
+
+    # Количество записей в БД
+    COUNT_OF_REC = 25
+    PER_PAGE = 10
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        Post.objects.bulk_create(
+            Post(author=cls.user, text=f'Пост номер {number}')
+            for number in range(cls.COUNT_OF_REC)
+        )
+        # У части постов одинаковая дата: порядок задаёт id
+        Post.objects.filter(
+            pk__in=Post.objects.values('pk')[:5]
+        ).update(pub_date=Post.objects.latest('pub_date').pub_date)
+        cls.expected = list(
+            Post.objects.order_by('-pub_date', '-pk').values_list(
+                'pk', flat=True)
+        )
+
+    def get_paginator(self):
+        return CursorPaginator(Post.objects.all(), self.PER_PAGE)
+
+    def test_walk_forward_and_back(self):
+        """Проход вперёд и назад по токенам выдаёт все посты по порядку."""
+        paginator = self.get_paginator()
+        page = paginator.get_page()
+        self.assertFalse(page.has_previous())
+        pages = [page]
+        while page.has_next():
+            page = paginator.get_page(after=page.next_cursor)
+            pages.append(page)
+        seen = [post.pk for page in pages for post in page]
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(len(pages), 3)
+
+        back = paginator.get_page(before=pages[-1].previous_cursor)
+        self.assertEqual(
+            [post.pk for post in back],
+            [post.pk for post in pages[1]],
+        )
+        first = paginator.get_page(before=pages[1].previous_cursor)
+        self.assertEqual(
+            [post.pk for post in first],
+            [post.pk for post in pages[0]],
+        )
+        self.assertFalse(first.has_previous())
+
+    def test_invalid_cursor_returns_first_page(self):
+        """Некорректный токен возвращает первую страницу."""
+        paginator = self.get_paginator()
+        for token in ('garbage', 'W10', 'WyJ4IiwieSJd'):
+            with self.subTest(token=token):
+                page = paginator.get_page(after=token)
+                self.assertEqual(
+                    [post.pk for post in page],
+                    self.expected[:self.PER_PAGE],
+                )
+
+    def test_cursor_with_wrong_value_types(self):
+        """Токен со значениями не того типа возвращает первую страницу."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:search') + '?q=Пост',
+            reverse('posts:post_comments', args=[self.expected[0]]),
+        )
+        values = (
+            [5, 1], [[1], 1], [{}, 1], [None, None], [True, 1],
+            ['2020-01-01T00:00:00', 10 ** 30], ['2020-01-01T00:00:00', 'x'],
+        )
+        paginator = CursorPaginator(
+            Post.objects.all(), self.PER_PAGE, ordering=('rank', '-pk'))
+        self.assertIsNone(paginator.decode_cursor(
+            paginator.encode_cursor(['x', 1])))
+        for value in values:
+            token = paginator.encode_cursor(value)
+            for url in urls:
+                with self.subTest(value=value, url=url):
+                    separator = '&' if '?' in url else '?'
+                    response = self.client.get(
+                        f'{url}{separator}after={token}')
+                    self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    @override_settings(CURSOR_PAGINATION=True)
+    def test_index_uses_cursor_links(self):
+        """Лента в курсорном режиме отдаёт ссылки ?after=."""
+        cache.clear()
+        response = Client().get(reverse('posts:index'))
+        page_obj = response.context['page_obj']
+        self.assertIsInstance(page_obj.paginator, CursorPaginator)
+        self.assertContains(response, f'?after={page_obj.next_cursor}')
+        self.assertNotContains(response, '?page=')
+
+
+class FeedPaginatorTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_page_window(self):
+        """Навигация показывает окно номеров с пропусками."""
+        paginator = FeedPaginator(list(range(200)), 10)
+        expected = {
+            1: [1, 2, 3, None, 20],
+            5: [1, 2, 3, 4, 5, 6, 7, None, 20],
+            10: [1, None, 8, 9, 10, 11, 12, None, 20],
+            20: [1, None, 18, 19, 20],
+        }
+        for number, window in expected.items():
+            with self.subTest(number=number):
+                self.assertEqual(
+                    page_window(paginator.page(number)), window)
+
+    def test_feed_count_is_cached_and_invalidated(self):
+        """Размер ленты берётся из кеша и сбрасывается при новом посте."""
+        Post.objects.create(author=self.user, group=self.group, text='1')
+        posts = self.group.posts.all()
+        self.assertEqual(get_feed_count(posts, 'group', self.group.pk), 1)
+        with self.assertNumQueries(0):
+            get_feed_count(posts, 'group', self.group.pk)
+        Post.objects.create(author=self.user, group=self.group, text='2')
+        self.assertIsNone(cache.get(feed_count_key('group', self.group.pk)))
+        self.assertEqual(get_feed_count(posts, 'group', self.group.pk), 2)
+
+    def test_group_change_invalidates_old_group(self):
+        """Перенос поста в другую группу сбрасывает счётчик старой."""
+        post = Post.objects.create(
+            author=self.user, group=self.group, text='1')
+        posts = self.group.posts.all()
+        get_feed_count(posts, 'group', self.group.pk)
+        post = Post.objects.get(pk=post.pk)
+        post.group = None
+        post.save()
+        self.assertEqual(get_feed_count(posts, 'group', self.group.pk), 0)
@@ -0,0 +1,77 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.template import engines
+from django.template.loaders.cached import Loader as CachedLoader
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Group, Post, User
+from ..templatetags import post_cards
+from ..templatetags.post_cards import fast_url
+
+
+class PostCardTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='автор.1+@x')
+        cls.group = Group.objects.create(title='Группа', slug='my-group_1')
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Текст')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_fast_url_matches_reverse(self):
+        """fast_url собирает те же адреса, что и reverse."""
+        cases = (
+            ('posts:profile', self.author.username),
+            ('posts:post_detail', self.post.pk),
+            ('posts:group_list', self.group.slug),
+        )
+        for name, value in cases:
+            with self.subTest(name=name):
+                self.assertEqual(
+                    fast_url(name, value), reverse(name, args=[value]))
+
+    def test_card_links(self):
+        """Карточка в ленте ссылается на автора, пост и группу."""
+        response = self.client.get(reverse('posts:index'))
+        for url in (
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', args=[self.post.pk]),
+            reverse('posts:group_list', args=[self.group.slug]),
+        ):
+            with self.subTest(url=url):
+                self.assertContains(response, f'href="{url}"')
+
+    def test_card_follows_group_and_author_changes(self):
+        """Карточка обновляется при правке группы и имени автора."""
+        self.client.get(reverse('posts:index'))
+        group = Group.objects.get(pk=self.group.pk)
+        group.slug = 'renamed'
+        group.save()
+        author = User.objects.get(pk=self.author.pk)
+        author.first_name = 'Лев'
+        author.last_name = 'Толстой'
+        author.save()
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(
+            response, reverse('posts:group_list', args=['renamed']))
+        self.assertContains(response, 'Лев Толстой')
+
+    def test_cached_card_skips_urls_and_thumbnails(self):
+        """Закешированная карточка не собирает адреса и миниатюру заново."""
+        self.client.get(reverse('posts:index'))
+        # Другой адрес страницы минует кеш страниц, но не карточек
+        with mock.patch.object(
+            post_cards, 'fast_url', wraps=post_cards.fast_url
+        ) as card_fast_url:
+            self.client.get(reverse('posts:index') + '?page=1')
+        card_fast_url.assert_not_called()
+
+    def test_templates_are_compiled_once(self):
+        """Шаблоны берутся из памяти загрузчиком cached."""
+        loaders = engines.all()[0].engine.template_loaders
+        self.assertIsInstance(loaders[0], CachedLoader)
@@ -0,0 +1,93 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Post
+from ..search import search_posts
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        cls.strong = Post.objects.create(
+            author=cls.user, text='Кошки, кошки и ещё раз кошки')
+        cls.weak = Post.objects.create(
+            author=cls.user,
+            text='Длинный рассказ о собаках, в котором есть одна кошка',
+        )
+        cls.other = Post.objects.create(author=cls.user, text='Про собак')
+
+    def setUp(self):
+        cache.clear()
+
+    def found(self, query):
+        return list(search_posts(Post.objects.all(), query).order_by(
+            'rank', '-pk').values_list('pk', flat=True))
+
+    def test_ranked_prefix_search(self):
+        """Поиск находит словоформы по префиксу и ранжирует их."""
+        self.assertEqual(self.found('кошк'), [self.strong.pk, self.weak.pk])
+        self.assertEqual(self.found('собак кошк'), [self.weak.pk])
+        self.assertEqual(self.found('" OR *'), [])
+
+    def test_index_follows_changes(self):
+        """Правка и удаление поста обновляют индекс."""
+        self.other.text = 'Теперь про кошку'
+        self.other.save()
+        self.assertIn(self.other.pk, self.found('кошк'))
+        self.assertEqual(self.found('собак'), [self.weak.pk])
+        self.other.text = 'Про собак'
+        self.other.save()
+        post_id = self.weak.pk
+        Post.objects.get(pk=post_id).delete()
+        self.assertNotIn(post_id, self.found('кошк'))
+
+    def test_rebuild_index(self):
+        """Команда перестройки индексирует посты, созданные без сигналов."""
+        post, = Post.objects.bulk_create(
+            [Post(author=self.user, text='Попугай')])
+        self.assertEqual(self.found('попугай'), [])
+        call_command('rebuild_search_index', stdout=None)
+        self.assertEqual(len(self.found('попугай')), 1)
+
+    @override_settings(POSTS_ON_PAGE=1)
+    def test_search_page(self):
+        """Страница поиска листается курсором с сохранением запроса."""
+        response = Client().get(reverse('posts:search'), {'q': 'кошк'})
+        page_obj = response.context['page_obj']
+        self.assertEqual(list(page_obj), [self.strong])
+        response = Client().get(
+            reverse('posts:search'),
+            {'q': 'кошк', 'after': page_obj.next_cursor},
+        )
+        self.assertEqual(list(response.context['page_obj']), [self.weak])
+
+    def test_empty_query(self):
+        """Пустой запрос даёт пустую выдачу, а не ошибку."""
+        self.assertEqual(self.found(''), [])
+        for params in ({}, {'q': ''}, {'q': '  '}, {'q': '"*'}):
+            with self.subTest(params=params):
+                response = Client().get(reverse('posts:search'), params)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertEqual(list(response.context['page_obj']), [])
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идёт по полнотекстовому индексу."""
+        client = Client()
+        client.force_login(self.admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'кошк'})
+        self.assertEqual(
+            set(response.context['cl'].result_list),
+            {self.strong, self.weak},
+        )
@@ -0,0 +1,106 @@
+import os
+import shutil
+import tempfile
+import time
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from .. import signals
+from ..models import ImageBlob, Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False)
+class DedupStorageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.storage = Post._meta.get_field('image').storage
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, name, content=b'meme'):
+        post = Post(author=self.user, text='Мем')
+        # Миниатюры не нужны: содержимое не картинка
+        with mock.patch.object(signals.thumbnails, 'schedule'):
+            post.image.save(name, ContentFile(content))
+        return post
+
+    def test_duplicates_share_one_file(self):
+        """Одинаковые загрузки хранятся одним файлом с двумя ссылками."""
+        first = self.create_post('meme.PNG')
+        second = self.create_post('copy-of-meme.png')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(first.image.name.endswith('.png'))
+        self.assertEqual(
+            ImageBlob.objects.get(name=first.image.name).references, 2)
+        stored = os.listdir(os.path.dirname(first.image.path))
+        self.assertEqual(stored, [os.path.basename(first.image.name)])
+
+    def test_file_deleted_with_last_reference(self):
+        """Файл удаляется вместе с последним ссылающимся постом."""
+        first = self.create_post('meme.png')
+        second = self.create_post('meme.png')
+        name = first.image.name
+        with mock.patch.object(
+            signals.transaction, 'on_commit', lambda func: func()
+        ), mock.patch.object(signals.thumbnails, 'forget') as forget:
+            first.delete()
+            self.assertTrue(self.storage.exists(name))
+            forget.assert_not_called()
+            second.delete()
+        self.assertFalse(self.storage.exists(name))
+        self.assertFalse(ImageBlob.objects.filter(name=name).exists())
+        forget.assert_called_once_with(name)
+
+    def test_untracked_files_are_kept(self):
+        """Файл без учёта ссылок не удаляется."""
+        name = self.create_post('other.png', b'other').image.name
+        ImageBlob.objects.filter(name=name).delete()
+        self.storage.delete(name)
+        self.assertTrue(self.storage.exists(name))
+
+    def test_assigned_name_is_counted(self):
+        """Картинка, присвоенная по имени, тоже держит ссылку на файл."""
+        first = self.create_post('meme.png')
+        name = first.image.name
+        with mock.patch.object(signals.thumbnails, 'schedule'):
+            second = Post.objects.create(
+                author=self.user, text='Репост', image=name)
+        self.assertEqual(ImageBlob.objects.get(name=name).references, 2)
+        with mock.patch.object(
+            signals.transaction, 'on_commit', lambda func: func()
+        ), mock.patch.object(signals.thumbnails, 'forget'):
+            first.delete()
+            self.assertTrue(self.storage.exists(name))
+            second.delete()
+        self.assertFalse(self.storage.exists(name))
+
+    def test_orphans_are_purged(self):
+        """Старые файлы без ссылок удаляются, используемые остаются."""
+        used = self.create_post('used.png', b'used').image.name
+        # Файл откатившейся транзакции: записан, но ссылки на него нет
+        orphan = self.storage.save('posts/orphan.png', ContentFile(b'lost'))
+        fresh = self.storage.save('posts/fresh.png', ContentFile(b'fresh'))
+        hour_ago = time.time() - 60 * 60
+        for name in (used, orphan):
+            os.utime(self.storage.path(name), (hour_ago, hour_ago))
+        out = StringIO()
+        call_command('purge_orphan_images', older_than=60, stdout=out)
+        self.assertIn('Удалено файлов: 1', out.getvalue())
+        self.assertTrue(self.storage.exists(used))
+        self.assertFalse(self.storage.exists(orphan))
+        self.assertTrue(self.storage.exists(fresh))
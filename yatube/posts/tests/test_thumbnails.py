@@ -0,0 +1,217 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from .. import thumbnails
+from ..templatetags.post_cards import post_card
+from ..templatetags.post_images import rendition
+from ..models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_image(name='picture.png', size=(50, 40)):
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 0, 0)).save(buffer, 'png')
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/png')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_saving_post_pregenerates_thumbnails(self):
+        """После сохранения поста миниатюры готовы в кеше."""
+        with mock.patch.object(
+            thumbnails.transaction, 'on_commit', lambda func: func()
+        ):
+            post = Post.objects.create(
+                author=self.user, text='Пост', image=make_image())
+        ready = cache.get(thumbnails.thumbnails_key(post.image.name))
+        self.assertEqual(
+            (ready['card']['width'], ready['card']['height']), (960, 339))
+        with mock.patch.object(thumbnails, 'get_thumbnail') as sorl:
+            self.assertEqual(
+                thumbnails.get_rendition(post.image.name, 'card'),
+                ready['card'],
+            )
+        sorl.assert_not_called()
+
+    def test_missing_source_is_skipped(self):
+        """Отсутствующая картинка не ломает генерацию и не строится снова."""
+        with self.assertLogs(level='WARNING'):
+            self.assertIsNone(
+                thumbnails.get_rendition('posts/missing.jpg', 'card'))
+        with mock.patch.object(thumbnails, 'get_thumbnail') as sorl:
+            self.assertIsNone(
+                thumbnails.get_rendition('posts/missing.jpg', 'card'))
+        sorl.assert_not_called()
+
+    def test_failure_is_cached_briefly_and_not_saved(self):
+        """Неудача помнится недолго и не попадает в манифест поста."""
+        with mock.patch.object(thumbnails, 'schedule'):
+            post = Post.objects.create(
+                author=self.user, text='Пост', image='posts/missing.png')
+        with mock.patch.object(
+            thumbnails.cache, 'set', wraps=thumbnails.cache.set
+        ) as cache_set, self.assertLogs(level='WARNING'):
+            thumbnails.build_manifest(post.pk, post.image.name)
+        self.assertEqual(
+            cache_set.call_args.args[2], settings.THUMBNAIL_FAILURE_TIMEOUT)
+        self.assertEqual(Post.objects.get(pk=post.pk).image_renditions, '')
+
+    def test_manifest_refreshes_cards_rendered_without_thumbnail(self):
+        """Карточка без миниатюры недолговечна, манифест сбрасывает кеш."""
+        with mock.patch.object(thumbnails, 'schedule'):
+            post = Post.objects.create(
+                author=self.user, text='Пост', image='posts/missing.png')
+        self.assertEqual(
+            post_card(post)['card_timeout'],
+            settings.THUMBNAIL_FAILURE_TIMEOUT,
+        )
+        url = reverse('posts:index')
+        with self.assertLogs(level='WARNING'):
+            self.assertNotContains(self.client.get(url), '<picture>')
+        card = {'url': '/media/card.jpg', 'width': 1, 'height': 1}
+        with mock.patch.object(
+            thumbnails, 'generate', return_value={'card': card}
+        ):
+            thumbnails.build_manifest(post.pk, post.image.name)
+        self.assertContains(self.client.get(url), '/media/card.jpg')
+        post = Post.objects.get(pk=post.pk)
+        self.assertEqual(
+            post_card(post)['card_timeout'], settings.CACHING_TIME)
+
+    def test_page_thumbnails_are_fetched_in_one_request(self):
+        """Миниатюры страницы читаются из кеша одним get_many."""
+        posts = [
+            Post.objects.create(
+                author=self.user, text=f'Пост {number}',
+                image=f'posts/picture{number}.png')
+            for number in range(3)
+        ]
+        for post in posts:
+            cache.set(
+                thumbnails.thumbnails_key(post.image.name),
+                {'card': {'url': post.image.name, 'width': 1, 'height': 1}},
+            )
+        with mock.patch.object(
+            thumbnails.cache, 'get_many', wraps=thumbnails.cache.get_many
+        ) as get_many, mock.patch.object(
+            thumbnails, 'get_rendition'
+        ) as get_rendition:
+            thumbnails.attach_thumbnails(posts)
+            urls = [rendition(post, 'card')['url'] for post in posts]
+        get_many.assert_called_once()
+        get_rendition.assert_not_called()
+        self.assertEqual(urls, [post.image.name for post in posts])
+
+    @override_settings(POST_RENDITION_FORMATS=('WEBP', 'PNG', 'JPEG'))
+    def test_manifest_saved_with_srcset(self):
+        """Манифест поста хранит srcset каждого доступного формата."""
+        with mock.patch.object(
+            thumbnails.transaction, 'on_commit', lambda func: func()
+        ), mock.patch.object(
+            thumbnails.features, 'check', return_value=False
+        ):
+            post = Post.objects.create(
+                author=self.user, text='Пост', image=make_image())
+        card = Post.objects.get(pk=post.pk).renditions['card']
+        self.assertEqual(
+            [source['type'] for source in card['sources']],
+            ['image/png', 'image/jpeg'],
+        )
+        for source in card['sources']:
+            with self.subTest(source=source['type']):
+                widths = [
+                    candidate.split()[-1]
+                    for candidate in source['srcset'].split(', ')
+                ]
+                self.assertEqual(widths, ['320w', '640w', '960w'])
+        self.assertTrue(card['url'].endswith('.jpg'))
+        cache.clear()
+        post = Post.objects.get(pk=post.pk)
+        with mock.patch.object(thumbnails, 'get_rendition') as get_rendition:
+            self.assertEqual(rendition(post, 'card'), card)
+        get_rendition.assert_not_called()
+
+    def test_new_image_resets_manifest(self):
+        """Смена картинки сбрасывает манифест, правка текста — нет."""
+        with mock.patch.object(thumbnails, 'schedule'):
+            post = Post.objects.create(
+                author=self.user, text='Пост', image='posts/old.png')
+        Post.objects.filter(pk=post.pk).update(
+            image_renditions='{"card": null}')
+        post = Post.objects.get(pk=post.pk)
+        post.text = 'Новый текст'
+        post.save()
+        self.assertNotEqual(
+            Post.objects.get(pk=post.pk).image_renditions, '')
+        post.image = 'posts/new.png'
+        with mock.patch.object(thumbnails, 'schedule'):
+            post.save()
+        self.assertEqual(
+            Post.objects.get(pk=post.pk).image_renditions, '')
+
+    @override_settings(POST_RENDITION_FORMATS=('JPEG', 'PNG'))
+    def test_fallback_is_jpeg(self):
+        """Запасная картинка — JPEG, даже если он не последний формат."""
+        with mock.patch.object(
+            thumbnails.transaction, 'on_commit', lambda func: func()
+        ):
+            post = Post.objects.create(
+                author=self.user, text='Пост', image=make_image())
+        card = Post.objects.get(pk=post.pk).renditions['card']
+        self.assertEqual(
+            [source['type'] for source in card['sources']],
+            ['image/jpeg', 'image/png'],
+        )
+        self.assertTrue(card['url'].endswith('.jpg'))
+        self.assertEqual((card['width'], card['height']), (960, 339))
+
+    def test_pregenerate_thumbnails_command(self):
+        """Команда строит манифесты постов, у которых их нет."""
+        names = {f'posts/picture{number}.png' for number in range(7)}
+        Post.objects.bulk_create(
+            [Post(author=self.user, text='Пост', image=name)
+             for name in sorted(names) * 2]
+        )
+        Post.objects.bulk_create([
+            Post(author=self.user, text='Готов', image='posts/ready.png',
+                 image_renditions='{"card": {}}'),
+        ])
+        out = StringIO()
+        with mock.patch(
+            'posts.management.commands.pregenerate_thumbnails'
+            '.build_manifest'
+        ) as build_manifest:
+            call_command('pregenerate_thumbnails', workers=1, stdout=out)
+        self.assertEqual(
+            sorted(call.args for call in build_manifest.call_args_list),
+            sorted(Post.objects.filter(text='Пост').values_list(
+                'pk', 'image')),
+        )
+        self.assertIn('для 14 постов', out.getvalue())
@@ -0,0 +1,142 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import timeline
+from ..counts import feed_count_key
+from ..models import Follow, Group, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def timeline(self):
+        return set(
+            TimelineEntry.objects.filter(user=self.reader).values_list(
+                'post_id', flat=True)
+        )
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост попадает в ленты подписчиков."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Пост')
+        self.assertEqual(self.timeline(), {post.pk})
+        post.delete()
+        self.assertEqual(self.timeline(), set())
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка заполняет ленту, отписка очищает её."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        self.reader_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': 'author'}))
+        self.assertEqual(self.timeline(), {post.pk})
+        self.reader_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': 'author'}))
+        self.assertEqual(self.timeline(), set())
+
+    def test_follow_index_has_no_n_plus_one(self):
+        """Лента подписок не делает запросов на каждый пост."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        for number in range(5):
+            Post.objects.create(
+                author=self.author, group=self.group, text=str(number))
+        url = reverse('posts:follow_index')
+        self.reader_client.get(url)
+        # Сессия, пользователь, популярные авторы, страница ключей ленты
+        # и посты страницы по id
+        with self.assertNumQueries(5):
+            response = self.reader_client.get(url)
+        self.assertEqual(len(response.context['page_obj']), 5)
+
+    def test_follow_feed_pages_follow_timeline_order(self):
+        """Страницы ленты идут в порядке записей ленты без пропусков."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        posts = [
+            Post.objects.create(author=self.author, text=str(number))
+            for number in range(15)
+        ]
+        url = reverse('posts:follow_index')
+        shown = []
+        for page in (1, 2):
+            response = self.reader_client.get(url, {'page': page})
+            shown.extend(response.context['page_obj'])
+        self.assertEqual(shown, posts[::-1])
+
+    @override_settings(FANOUT_FOLLOWERS_LIMIT=0)
+    def test_popular_author_is_merged_on_read(self):
+        """Посты популярного автора подмешиваются в ленту при чтении."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Пост')
+        self.assertEqual(self.timeline(), set())
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), [post])
+        newer = Post.objects.create(author=self.author, text='Новый')
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), [newer, post])
+
+    @override_settings(FANOUT_FOLLOWERS_LIMIT=1, TIMELINE_ASYNC=False)
+    def test_author_below_limit_is_fanned_out(self):
+        """Посты автора раскладываются, когда он перестаёт быть популярным."""
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=other, author=self.author)
+        post = Post.objects.create(author=self.author, text='Пост')
+        self.assertEqual(self.timeline(), set())
+        self.reader_client.get(reverse('posts:follow_index'))
+        callbacks = []
+        with mock.patch.object(
+            timeline.transaction, 'on_commit', callbacks.append
+        ):
+            Follow.objects.filter(user=other).delete()
+        # Раскладка ждёт фиксации транзакции и не идёт в запросе отписки
+        self.assertEqual(self.timeline(), set())
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.timeline(), {post.pk})
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), [post])
+        self.assertEqual(response.context['page_obj'].paginator.count, 1)
+
+    def test_rebuild_timelines(self):
+        """Команда rebuild_timelines восстанавливает ленты."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.bulk_create(
+            [Post(author=self.author, text='Пост')])
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(
+            self.timeline(),
+            set(Post.objects.values_list('pk', flat=True)),
+        )
+
+    @override_settings(FANOUT_FOLLOWERS_LIMIT=0)
+    def test_rebuild_timelines_skips_popular_authors(self):
+        """Перестройка лент не раскладывает посты популярных авторов."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Пост')
+        cache.set(feed_count_key('follow', self.reader.pk), 10)
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(self.timeline(), set())
+        self.assertIsNone(cache.get(feed_count_key('follow', self.reader.pk)))
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), [post])
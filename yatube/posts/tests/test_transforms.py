@@ -0,0 +1,189 @@
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from .. import signals, transforms
+from ..models import Post
+from ..templatetags.post_images import transform_url
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+TEMP_CACHE_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    TRANSFORM_CACHE_DIR=TEMP_CACHE_DIR,
+    MEDIA_ACCEL=None,
+)
+class TransformTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        buffer = BytesIO()
+        Image.new('RGB', (400, 200), (10, 200, 10)).save(buffer, 'PNG')
+        storage = Post._meta.get_field('image').storage
+        with override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT):
+            cls.image_name = storage.save(
+                'posts/picture.png', ContentFile(buffer.getvalue()))
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        shutil.rmtree(TEMP_CACHE_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        shutil.rmtree(TEMP_CACHE_DIR, ignore_errors=True)
+
+    def url(self, *args, **kwargs):
+        image = Post(image=self.image_name).image
+        return transform_url(image, *args, **kwargs)
+
+    def test_rendered_then_served_from_disk(self):
+        """Преобразование строится один раз и затем отдаётся с диска."""
+        url = self.url(100, 100, image_format='png')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        with Image.open(BytesIO(b''.join(response.streaming_content))) as im:
+            self.assertEqual((im.format, im.size), ('PNG', (100, 100)))
+        with mock.patch.object(transforms, '_render') as render:
+            with self.assertNumQueries(0):
+                response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        render.assert_not_called()
+
+    def test_fit_without_crop(self):
+        """Без обрезки картинка вписывается в размер с сохранением сторон."""
+        spec = transforms.load(
+            self.url(100, 100, crop=False).split('/')[-2])
+        with Image.open(transforms.get_or_render(spec)) as image:
+            self.assertEqual((image.format, image.size), ('JPEG', (100, 50)))
+
+    def test_bad_requests(self):
+        """Поддельный токен и отсутствующий исходник дают 404."""
+        token = self.url(50, 50).split('/')[-2]
+        self.assertEqual(self.client.get(f'/img/{token}x/').status_code, 404)
+        missing = transforms.sign('posts/missing.png', 50, 50)
+        with self.assertLogs(transforms.logger, 'WARNING'):
+            response = self.client.get(f'/img/{missing}/')
+        self.assertEqual(response.status_code, 404)
+        with self.assertRaises(ValueError):
+            transforms.sign(self.image_name, 10 ** 6, 10)
+
+    def test_concurrent_requests_render_once(self):
+        """Одновременные запросы строят преобразование один раз."""
+        spec = transforms.load(self.url(60, 60).split('/')[-2])
+        render = transforms._render
+
+        def slow_render(*args):
+            time.sleep(0.2)
+            render(*args)
+
+        with mock.patch.object(
+            transforms, '_render', side_effect=slow_render
+        ) as mocked, ThreadPoolExecutor(4) as pool:
+            paths = list(pool.map(
+                transforms.get_or_render, [spec] * 4))
+        self.assertEqual(mocked.call_count, 1)
+        self.assertEqual(len(set(paths)), 1)
+        self.assertTrue(os.path.exists(paths[0]))
+
+    def test_least_recently_used_evicted(self):
+        """При переполнении кеша удаляются давно не запрошенные файлы."""
+        paths = []
+        for width in (10, 20, 30):
+            spec = transforms.load(self.url(width, 10).split('/')[-2])
+            paths.append(transforms.get_or_render(spec))
+        # Первый файл запрошен последним
+        old = time.time() - 100
+        for number, path in enumerate(paths):
+            os.utime(path, (old + number, old + number))
+        os.utime(paths[0])
+        sizes = [os.path.getsize(path) for path in paths]
+        transforms.evict(max_bytes=sizes[0] + sizes[2])
+        self.assertEqual(
+            [os.path.exists(path) for path in paths], [True, False, False])
+
+    def test_not_modified_across_hits(self):
+        """ETag не меняется от попаданий, повторный запрос получает 304."""
+        url = self.url(80, 80)
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url)['ETag'], etag)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_token_stable_within_window(self):
+        """Адрес не меняется в пределах окна срока действия."""
+        max_age = settings.TRANSFORM_URL_MAX_AGE
+        start = (int(time.time()) // max_age + 1) * max_age
+        urls = set()
+        for moment in (start, start + 60, start + max_age - 1):
+            with mock.patch.object(
+                transforms.time, 'time', return_value=moment
+            ):
+                urls.add(self.url(50, 50))
+        self.assertEqual(len(urls), 1)
+
+    def test_expired_token(self):
+        """Токен не принимается после окончания срока действия."""
+        url = self.url(50, 50)
+        max_age = settings.TRANSFORM_URL_MAX_AGE
+        with mock.patch.object(
+            transforms.time, 'time',
+            return_value=time.time() + max_age - 1,
+        ):
+            self.assertEqual(
+                self.client.get(url).status_code, HTTPStatus.OK)
+        with mock.patch.object(
+            transforms.time, 'time',
+            return_value=time.time() + 2 * max_age + 1,
+        ):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_size_counter_spares_directory_walks(self):
+        """Каталог кеша обходится, лишь когда счётчик превысил предел."""
+        transforms.get_or_render(
+            transforms.load(self.url(10, 10).split('/')[-2]))
+        with mock.patch.object(
+            transforms, '_cache_files', wraps=transforms._cache_files
+        ) as cache_files:
+            transforms.get_or_render(
+                transforms.load(self.url(20, 20).split('/')[-2]))
+            cache_files.assert_not_called()
+            size = cache.get(transforms.SIZE_KEY)
+            with override_settings(TRANSFORM_CACHE_MAX_BYTES=size):
+                transforms.get_or_render(
+                    transforms.load(self.url(30, 30).split('/')[-2]))
+            cache_files.assert_called_once()
+        on_disk = sum(
+            file_size for _, file_size, _
+            in transforms._cache_files(TEMP_CACHE_DIR))
+        self.assertEqual(cache.get(transforms.SIZE_KEY), on_disk)
+        self.assertLessEqual(on_disk, size * transforms.EVICT_TO)
+
+    def test_purged_with_released_source(self):
+        """Удаление исходника удаляет и его преобразования."""
+        spec = transforms.load(self.url(40, 40).split('/')[-2])
+        path = transforms.get_or_render(spec)
+        storage = Post._meta.get_field('image').storage
+        with mock.patch.object(
+            signals.transaction, 'on_commit', lambda func: func()
+        ), mock.patch.object(
+            storage, 'release', return_value=True
+        ), mock.patch.object(signals.thumbnails, 'forget'):
+            signals._release_image(self.image_name)
+        self.assertFalse(os.path.exists(path))
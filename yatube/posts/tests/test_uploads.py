@@ -0,0 +1,126 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from ..forms import PostForm
+from ..models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+# Тег EXIF Orientation: 6 — снимок нужно повернуть на 90° по часовой
+ORIENTATION = 0x0112
+
+
+def camera_photo(size=(400, 200), orientation=6):
+    image = Image.new('RGB', size, (0, 120, 200))
+    exif = image.getexif()
+    exif[ORIENTATION] = orientation
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', exif=exif.tobytes(), quality=95)
+    return SimpleUploadedFile('IMG_0001.JPEG', buffer.getvalue(),
+                              'image/jpeg')
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    THUMBNAIL_ASYNC=False,
+    IMAGE_UPLOAD_MAX_SIZE=(100, 100),
+)
+class UploadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_photo_normalized(self):
+        """Снимок повёрнут по EXIF, уменьшен и сохранён в JPEG без EXIF."""
+        self.client.post(
+            reverse('posts:post_create'),
+            {'text': 'Снимок', 'image': camera_photo()},
+        )
+        post = Post.objects.get(text='Снимок')
+        self.assertRegex(post.image.name, r'^posts/\w\w/\w{64}\.jpg$')
+        # Повёрнут по EXIF и вписан в 100×100
+        self.assertEqual((post.image_width, post.image_height), (50, 100))
+        with Image.open(post.image.path) as stored:
+            self.assertEqual(stored.size, (50, 100))
+            self.assertEqual(stored.format, 'JPEG')
+            self.assertNotIn(ORIENTATION, stored.getexif())
+
+    def test_gif_kept_as_is(self):
+        """GIF в пределах размера сохраняется без изменений."""
+        buffer = BytesIO()
+        Image.new('P', (80, 10)).save(buffer, 'GIF')
+        upload = SimpleUploadedFile('anim.gif', buffer.getvalue(),
+                                    'image/gif')
+        form = PostForm({'text': 'Гифка'}, {'image': upload})
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data['image'].read(),
+                         buffer.getvalue())
+        self.assertEqual(form.instance.image_width, 80)
+
+    def test_large_still_gif_resized(self):
+        """Крупный статичный GIF уменьшается и сохраняется в PNG."""
+        buffer = BytesIO()
+        Image.new('P', (300, 10)).save(buffer, 'GIF')
+        upload = SimpleUploadedFile('still.gif', buffer.getvalue(),
+                                    'image/gif')
+        form = PostForm({'text': 'Гифка'}, {'image': upload})
+        self.assertTrue(form.is_valid())
+        with Image.open(form.cleaned_data['image']) as stored:
+            self.assertEqual(stored.format, 'PNG')
+            self.assertEqual(stored.width, 100)
+
+    def test_large_animation_rejected(self):
+        """Анимированный GIF крупнее IMAGE_UPLOAD_MAX_SIZE отклоняется."""
+        frames = [Image.new('P', (300, 10), color) for color in (1, 2)]
+        buffer = BytesIO()
+        frames[0].save(buffer, 'GIF', save_all=True,
+                       append_images=frames[1:])
+        upload = SimpleUploadedFile('anim.gif', buffer.getvalue(),
+                                    'image/gif')
+        form = PostForm({'text': 'Анимация'}, {'image': upload})
+        self.assertFalse(form.is_valid())
+        self.assertIn('image', form.errors)
+
+    @override_settings(IMAGE_UPLOAD_MAX_PIXELS=1000)
+    def test_huge_image_rejected(self):
+        """Картинка больше IMAGE_UPLOAD_MAX_PIXELS отклоняется формой."""
+        form = PostForm({'text': 'Бомба'}, {'image': camera_photo()})
+        self.assertFalse(form.is_valid())
+        self.assertIn('image', form.errors)
+
+    def test_transparency_becomes_white(self):
+        """Прозрачный фон при сохранении в JPEG становится белым."""
+        image = Image.new('RGBA', (40, 40), (0, 0, 0, 0))
+        image.paste((200, 0, 0, 255), (10, 10, 30, 30))
+        buffer = BytesIO()
+        image.save(buffer, 'TIFF')
+        upload = SimpleUploadedFile('logo.tiff', buffer.getvalue(),
+                                    'image/tiff')
+        form = PostForm({'text': 'Логотип'}, {'image': upload})
+        self.assertTrue(form.is_valid())
+        with Image.open(form.cleaned_data['image']) as stored:
+            self.assertEqual(stored.format, 'JPEG')
+            corner = stored.getpixel((0, 0))
+            center = stored.getpixel((20, 20))
+        self.assertTrue(all(channel > 230 for channel in corner))
+        self.assertGreater(center[0], 150)
+        self.assertLess(center[1], 60)
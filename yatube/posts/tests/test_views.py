@@ -337,9 +337,9 @@ class PostViewTests(TestCase):
     def test_cache_index_page(self):
         """Работа кеша на главной странице."""
         response_0 = self.authorized_client.get('/')
+        with self.assertNumQueries(2):
+            response_1 = self.authorized_client.get('/')
         Post.objects.latest('pub_date').delete()
-        response_1 = self.authorized_client.get('/')
-        cache.clear()
         response_2 = self.authorized_client.get('/')
         self.assertEqual(
             response_0.content,
@@ -349,7 +349,7 @@ class PostViewTests(TestCase):
         self.assertNotEqual(
             response_1.content,
             response_2.content,
-            'После обновления кеша главная страница не обновляется'
+            'После удаления поста главная страница не обновляется'
         )
 
     def test_add_comment_authorized_client(self):
@@ -0,0 +1,194 @@
+"""Предварительная генерация миниатюр картинок постов.
+
+Каждая миниатюра из POST_THUMBNAILS строится в нескольких ширинах
+(POST_RENDITION_WIDTHS и полная ширина геометрии) и форматах
+(POST_RENDITION_FORMATS, которые поддерживает Pillow). Данные миниатюры —
+адрес и размеры запасного варианта в JPEG полной ширины и список sources
+с srcset для каждого формата.
+
+После сохранения поста с новой картинкой миниатюры строятся в фоновом
+пуле потоков, а их данные кладутся в кеш и в манифест поста
+(Post.image_renditions), так что показ карточки не обращается ни
+к кешу, ни к хранилищу. Шаблоны берут готовые данные фильтром rendition
+и генерируют миниатюру сами, только если фоновая задача ещё не успела.
+"""
+import hashlib
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from PIL import features
+from sorl.thumbnail import delete, get_thumbnail
+
+from core import metrics
+
+from .models import Post
+from .versions import bump_post
+
+logger = logging.getLogger(__name__)
+
+THUMBNAILS_KEY = 'thumbnails:{digest}'
+
+_executor = None
+
+
+def thumbnails_key(image_name):
+    return THUMBNAILS_KEY.format(
+        digest=hashlib.md5(image_name.encode()).hexdigest())
+
+
+def available_formats():
+    """Форматы миниатюр, которые умеет кодировать установленный Pillow."""
+    return [
+        image_format for image_format in settings.POST_RENDITION_FORMATS
+        if image_format != 'WEBP' or features.check('webp')
+    ]
+
+
+def _widths(full_width):
+    return sorted(
+        {width for width in settings.POST_RENDITION_WIDTHS
+         if width < full_width} | {full_width})
+
+
+def _render(image_name, rendition):
+    """Строит миниатюру через sorl; None, если исходник не читается."""
+    geometry, options = settings.POST_THUMBNAILS[rendition]
+    full_width, full_height = (int(side) for side in geometry.split('x'))
+    metrics.count('thumb')
+    sources = []
+    try:
+        with metrics.timed('thumb'):
+            for image_format in available_formats():
+                srcset = []
+                for width in _widths(full_width):
+                    height = round(full_height * width / full_width)
+                    thumbnail = get_thumbnail(
+                        image_name, f'{width}x{height}',
+                        format=image_format, **options)
+                    srcset.append(f'{thumbnail.url} {thumbnail.width}w')
+                sources.append({
+                    'type': f'image/{image_format.lower()}',
+                    'srcset': ', '.join(srcset),
+                })
+            # Запасной <img> для браузеров без <picture> — всегда JPEG;
+            # если он уже построен выше, sorl вернёт его из хранилища
+            fallback = get_thumbnail(
+                image_name, geometry, format='JPEG', **options)
+    except Exception:
+        logger.warning(
+            'Не удалось построить миниатюру %s для %s', rendition, image_name)
+        return None
+    return {
+        'url': fallback.url,
+        'width': fallback.width,
+        'height': fallback.height,
+        'sources': sources,
+    }
+
+
+def generate(image_name, renditions=None):
+    """Строит миниатюры картинки и сохраняет их данные в кеш."""
+    key = thumbnails_key(image_name)
+    ready = cache.get(key) or {}
+    for rendition in renditions or settings.POST_THUMBNAILS:
+        if rendition in ready:
+            continue
+        ready[rendition] = _render(image_name, rendition)
+    # Неудача запоминается ненадолго: битый исходник не пересобирается
+    # при каждом показе карточки, а временный сбой хранилища проходит
+    timeout = (
+        settings.THUMBNAIL_FAILURE_TIMEOUT if None in ready.values()
+        else None
+    )
+    cache.set(key, ready, timeout)
+    return ready
+
+
+def get_rendition(image_name, rendition):
+    """Готовая миниатюра из кеша, при промахе строится на месте."""
+    ready = cache.get(thumbnails_key(image_name)) or {}
+    if rendition in ready:
+        return ready[rendition]
+    return generate(image_name, [rendition]).get(rendition)
+
+
+def attach_thumbnails(posts):
+    """Проставляет постам thumbnails — готовые миниатюры их картинок.
+
+    Посты с манифестом миниатюр пропускаются, данные остальных картинок
+    страницы читаются из кеша одним запросом. Картинки без готовых
+    миниатюр получают пустой словарь: их строит фильтр rendition
+    при выводе карточки.
+    """
+    posts = [
+        post for post in posts if post.image and not post.image_renditions]
+    keys = {post.pk: thumbnails_key(post.image.name) for post in posts}
+    found = cache.get_many(set(keys.values()))
+    for post in posts:
+        post.thumbnails = found.get(keys[post.pk], {})
+
+
+def build_manifest(post_id, image_name):
+    """Строит миниатюры и сохраняет их манифест в пост.
+
+    Манифест пишется, только если картинка поста с тех пор не сменилась.
+    Неудавшиеся миниатюры в него не попадают: их снова попробует
+    построить фильтр rendition, когда истечёт кеш неудачи, или команда
+    pregenerate_thumbnails. Записанный манифест сбрасывает кеш страниц
+    и карточки поста, отрисованных без миниатюр.
+    """
+    ready = {
+        rendition: data
+        for rendition, data in generate(image_name).items()
+        if data is not None
+    }
+    if not ready:
+        return
+    if not Post.objects.filter(pk=post_id, image=image_name).update(
+            image_renditions=json.dumps(ready)):
+        return
+    post = Post.objects.select_related('author').filter(pk=post_id).first()
+    if post is not None:
+        bump_post(post, {post.group_id})
+
+
+def forget(image_name):
+    """Удаляет миниатюры картинки, исходник которой удалён."""
+    try:
+        delete(image_name, delete_file=False)
+    except Exception:
+        logger.warning('Не удалось удалить миниатюры %s', image_name)
+    cache.delete(thumbnails_key(image_name))
+
+
+def _run(post_id, image_name):
+    try:
+        build_manifest(post_id, image_name)
+    finally:
+        # У потоков пула собственные соединения с базой
+        connection.close()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+    return _executor
+
+
+def schedule(post_id, image_name):
+    """Ставит генерацию миниатюр в очередь после фиксации транзакции."""
+    if not image_name:
+        return
+    if settings.THUMBNAIL_ASYNC:
+        transaction.on_commit(
+            lambda: _get_executor().submit(_run, post_id, image_name))
+    else:
+        transaction.on_commit(lambda: build_manifest(post_id, image_name))
@@ -0,0 +1,278 @@
+"""Лента подписок с гибридной раскладкой постов.
+
+Посты обычных авторов раскладываются в ленты подписчиков при публикации
+(fan-out on write): подписка добавляет в ленту все посты автора,
+отписка их убирает, удалённые посты пропадают каскадом. Посты авторов,
+у которых подписчиков больше FANOUT_FOLLOWERS_LIMIT, не раскладываются,
+а подмешиваются при чтении из кеша последних постов автора.
+
+Лента читается по индексу (user, -pub_date) таблицы записей лент:
+страница выбирается по ней, а посты страницы — по id.
+"""
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils.functional import cached_property
+
+from .counts import get_feed_count, invalidate_follow_feeds
+from .models import Follow, Post, TimelineEntry, UserCounters
+
+RECENT_POSTS_KEY = 'author_recent_posts:{pk}'
+
+_executor = None
+
+
+def is_popular(author_id):
+    """Публикации автора подмешиваются при чтении, а не раскладываются."""
+    return UserCounters.objects.filter(
+        user=author_id,
+        followers_count__gt=settings.FANOUT_FOLLOWERS_LIMIT,
+    ).exists()
+
+
+def recent_post_ids(author_ids):
+    """Id последних постов авторов из кеша, промахи читаются из базы."""
+    keys = {RECENT_POSTS_KEY.format(pk=pk): pk for pk in author_ids}
+    cached = cache.get_many(keys)
+    post_ids = [pk for ids in cached.values() for pk in ids]
+    missing = {}
+    for key, author_id in keys.items():
+        if key in cached:
+            continue
+        ids = list(
+            Post.objects.filter(author=author_id).values_list(
+                'pk', flat=True)[:settings.RECENT_POSTS_SIZE]
+        )
+        missing[key] = ids
+        post_ids.extend(ids)
+    if missing:
+        cache.set_many(missing, settings.RECENT_POSTS_TIMEOUT)
+    return post_ids
+
+
+def forget_recent_posts(author_id):
+    cache.delete(RECENT_POSTS_KEY.format(pk=author_id))
+
+
+class FollowFeed:
+    """Лента подписок пользователя как последовательность для Paginator.
+
+    Срез берёт ключи (pub_date, post_id) записей ленты, сливает их
+    с ключами последних постов популярных авторов (их не больше
+    RECENT_POSTS_SIZE на автора) и читает посты среза одним запросом.
+    """
+
+    ordered = True
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.entries = TimelineEntry.objects.filter(
+            user=user_id).order_by('-pub_date', '-post_id')
+
+    @cached_property
+    def merged(self):
+        """Ключи недостающих в ленте постов популярных авторов, по убыванию."""
+        popular_ids = Follow.objects.filter(
+            user=self.user_id,
+            author__counters__followers_count__gt=(
+                settings.FANOUT_FOLLOWERS_LIMIT),
+        ).values_list('author_id', flat=True)
+        recent_ids = recent_post_ids(popular_ids)
+        if not recent_ids:
+            return []
+        keys = Post.objects.filter(pk__in=recent_ids).exclude(
+            pk__in=self.entries.values('post_id')
+        ).values_list('pub_date', 'pk')
+        return sorted(keys, reverse=True)
+
+    def count(self):
+        """Размер ленты: число записей из кеша плюс подмешанные посты.
+
+        Подмешанные посты считаются при каждом чтении: публикация
+        популярного автора не сбрасывает счётчики его подписчиков.
+        """
+        return (
+            get_feed_count(self.entries, 'follow', self.user_id)
+            + len(self.merged)
+        )
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop = index.start or 0, index.stop
+        entries = self.entries.values_list('pub_date', 'post_id')
+        if stop is not None:
+            entries = entries[:stop]
+        keys = islice(
+            heapq.merge(entries, self.merged, reverse=True), start, stop)
+        ids = [pk for _, pk in keys]
+        posts = Post.objects.select_related('group', 'author').in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+def fan_out(post):
+    """Добавляет пост в ленты всех подписчиков автора.
+
+    Для популярного автора лишь сбрасывает кеш его последних постов.
+    """
+    forget_recent_posts(post.author_id)
+    if is_popular(post.author_id):
+        return
+    follower_ids = Follow.objects.filter(
+        author=post.author_id).values_list('user_id', flat=True)
+    batch = []
+    for user_id in follower_ids.iterator():
+        batch.append(
+            TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+        )
+        if len(batch) >= settings.TIMELINE_BATCH_SIZE:
+            _write(batch)
+            batch = []
+    _write(batch)
+
+
+def _write(entries):
+    if not entries:
+        return
+    TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True)
+    invalidate_follow_feeds(entry.user_id for entry in entries)
+
+
+def _materialize(author_id, user_ids=None):
+    """Добавляет посты автора в ленты подписчиков (или только user_ids).
+
+    Вставка идёт одним INSERT ... SELECT, уже разложенные посты
+    пропускаются.
+    """
+    entry_table = TimelineEntry._meta.db_table
+    sql = (
+        f'INSERT INTO {entry_table} (user_id, post_id, pub_date) '
+        f'SELECT f.user_id, p.id, p.pub_date '
+        f'FROM {Follow._meta.db_table} f '
+        f'JOIN {Post._meta.db_table} p ON p.author_id = f.author_id '
+        f'WHERE f.author_id = %s '
+    )
+    params = [author_id]
+    if user_ids is not None:
+        placeholders = ', '.join(['%s'] * len(user_ids))
+        sql += f'AND f.user_id IN ({placeholders}) '
+        params.extend(user_ids)
+    sql += (
+        f'AND NOT EXISTS (SELECT 1 FROM {entry_table} e '
+        f'WHERE e.user_id = f.user_id AND e.post_id = p.id)'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту пользователя все посты автора.
+
+    Как и rebuild_timelines, в ленту попадает вся история автора.
+    """
+    if is_popular(author_id):
+        return
+    _materialize(author_id, [user_id])
+
+
+def settle(author_id):
+    """Раскладывает посты автора, переставшего быть популярным.
+
+    Пока у автора больше FANOUT_FOLLOWERS_LIMIT подписчиков, его посты
+    не попадают в ленты. Когда подписчиков становится не больше предела,
+    вся история автора добавляется в ленты оставшихся подписчиков —
+    после фиксации транзакции и, при TIMELINE_ASYNC, в фоновом потоке.
+    """
+    if not UserCounters.objects.filter(
+        user=author_id,
+        followers_count=settings.FANOUT_FOLLOWERS_LIMIT,
+    ).exists():
+        return
+    if settings.TIMELINE_ASYNC:
+        transaction.on_commit(
+            lambda: _get_executor().submit(_run, author_id))
+    else:
+        transaction.on_commit(lambda: _settle(author_id))
+
+
+def _settle(author_id):
+    """Раскладывает посты автора пачками по TIMELINE_BATCH_SIZE лент."""
+    # Пока задача ждала очереди, автор мог снова стать популярным
+    if is_popular(author_id):
+        return
+    follower_ids = Follow.objects.filter(author=author_id).order_by(
+        'user_id').values_list('user_id', flat=True)
+    batch = []
+    for user_id in follower_ids.iterator():
+        batch.append(user_id)
+        if len(batch) >= settings.TIMELINE_BATCH_SIZE:
+            _settle_batch(author_id, batch)
+            batch = []
+    _settle_batch(author_id, batch)
+
+
+def _settle_batch(author_id, user_ids):
+    if not user_ids:
+        return
+    _materialize(author_id, user_ids)
+    invalidate_follow_feeds(user_ids)
+
+
+def _run(author_id):
+    try:
+        _settle(author_id)
+    finally:
+        # У потоков пула собственные соединения с базой
+        connection.close()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        # Один поток: раскладки одного автора не должны идти параллельно
+        _executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='timeline')
+    return _executor
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты пользователя посты автора."""
+    TimelineEntry.objects.filter(
+        user=user_id, post__author=author_id).delete()
+
+
+def rebuild_timelines():
+    """Заново строит ленты всех пользователей по подпискам.
+
+    Посты популярных авторов, как и при публикации, не раскладываются.
+    Кешированные размеры лент подписок после перестройки сбрасываются.
+    """
+    entry_table = TimelineEntry._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        TimelineEntry.objects.all().delete()
+        cursor.execute(
+            f'INSERT INTO {entry_table} (user_id, post_id, pub_date) '
+            f'SELECT f.user_id, p.id, p.pub_date '
+            f'FROM {Follow._meta.db_table} f '
+            f'JOIN {Post._meta.db_table} p ON p.author_id = f.author_id '
+            f'LEFT JOIN {UserCounters._meta.db_table} c '
+            f'ON c.user_id = f.author_id '
+            f'WHERE COALESCE(c.followers_count, 0) <= %s',
+            [settings.FANOUT_FOLLOWERS_LIMIT],
+        )
+    user_ids = get_user_model().objects.values_list('pk', flat=True)
+    batch = []
+    for user_id in user_ids.iterator():
+        batch.append(user_id)
+        if len(batch) >= settings.TIMELINE_BATCH_SIZE:
+            invalidate_follow_feeds(batch)
+            batch = []
+    invalidate_follow_feeds(batch)
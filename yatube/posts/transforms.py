@@ -0,0 +1,265 @@
+"""Преобразование картинок постов по подписанным адресам.
+
+Адрес преобразования содержит подписанное описание: имя исходника,
+ширину, высоту, обрезку и формат. Подпись не даёт заказать произвольные
+размеры, а имя исходника в ней избавляет от запросов к базе. Результат
+строится при первом запросе и пишется в дисковый кеш
+TRANSFORM_CACHE_DIR в каталог своего исходника, который удаляется
+вместе с исходником. Попадание обновляет время доступа файла (время
+изменения, от которого зависит ETag, остаётся прежним). Размер
+дискового кеша ведётся счётчиком в общем кеше, и лишь когда он
+превышает TRANSFORM_CACHE_MAX_BYTES, каталог обходится и давно
+не запрашивавшиеся файлы удаляются (LRU). Одновременные запросы одного
+преобразования строит один из них под блокировкой в общем кеше,
+остальные ждут готовый файл.
+
+Срок действия токена округлён до окна в TRANSFORM_URL_MAX_AGE секунд:
+адрес не меняется в пределах окна, поэтому браузеры и страницы
+в кеше не получают новый адрес на каждую отрисовку, а действует токен
+не меньше TRANSFORM_URL_MAX_AGE и не больше вдвое большего срока.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+
+from core import metrics
+from core.caching import acquire_lock, release_lock
+
+from .models import Post
+from .uploads import flatten
+
+logger = logging.getLogger(__name__)
+
+SALT = 'posts.transforms'
+# Формат в адресе -> (формат Pillow, расширение файла)
+FORMATS = {
+    'jpeg': ('JPEG', '.jpg'),
+    'png': ('PNG', '.png'),
+    'webp': ('WEBP', '.webp'),
+}
+# После вытеснения кеш занимает не больше этой доли предела
+EVICT_TO = 0.9
+# Ключ счётчика байтов в TRANSFORM_CACHE_DIR
+SIZE_KEY = 'transform_cache_size'
+
+Spec = namedtuple('Spec', 'image_name width height crop image_format')
+
+
+def sign(image_name, width, height, crop=True, image_format='jpeg'):
+    """Подписанный токен преобразования картинки image_name.
+
+    WebP заменяется на JPEG, если Pillow не умеет его кодировать.
+    """
+    max_size = settings.TRANSFORM_MAX_SIZE
+    if not (0 < width <= max_size and 0 < height <= max_size):
+        raise ValueError(f'Недопустимый размер: {width}x{height}')
+    if image_format not in FORMATS:
+        raise ValueError(f'Неизвестный формат: {image_format}')
+    if image_format == 'webp' and not features.check('webp'):
+        image_format = 'jpeg'
+    max_age = settings.TRANSFORM_URL_MAX_AGE
+    expires = (int(time.time()) // max_age + 2) * max_age
+    payload = json.dumps(
+        [image_name, width, height, bool(crop), image_format, expires],
+        separators=(',', ':'),
+    )
+    return signing.Signer(salt=SALT).sign(
+        signing.b64_encode(payload.encode()).decode())
+
+
+def load(token):
+    """Описание преобразования из токена.
+
+    BadSignature при подделке, SignatureExpired (её подкласс) для токена
+    с истёкшим сроком.
+    """
+    value = signing.Signer(salt=SALT).unsign(token)
+    try:
+        *spec, expires = json.loads(signing.b64_decode(value.encode()))
+    except (TypeError, ValueError):
+        # Подписанный токен прежнего формата с отметкой времени
+        raise signing.BadSignature('Неизвестный формат токена')
+    if expires < time.time():
+        raise signing.SignatureExpired('Срок действия адреса истёк')
+    return Spec(*spec)
+
+
+def _source_directory(image_name):
+    digest = hashlib.sha256(image_name.encode()).hexdigest()
+    return f'{digest[:2]}/{digest}'
+
+
+def cache_name(spec):
+    """Имя файла преобразования относительно TRANSFORM_CACHE_DIR."""
+    digest = hashlib.sha256(
+        '\x00'.join(str(part) for part in spec).encode()).hexdigest()
+    return (
+        f'{_source_directory(spec.image_name)}/'
+        f'{digest}{FORMATS[spec.image_format][1]}'
+    )
+
+
+def purge(image_name):
+    """Удаляет все преобразования картинки image_name."""
+    shutil.rmtree(
+        os.path.join(
+            settings.TRANSFORM_CACHE_DIR, _source_directory(image_name)),
+        ignore_errors=True,
+    )
+
+
+def _touch(path):
+    # Время доступа служит временем последнего запроса для LRU
+    try:
+        stat = os.stat(path)
+        os.utime(path, ns=(time.time_ns(), stat.st_mtime_ns))
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def _render(spec, target):
+    storage = Post._meta.get_field('image').storage
+    image_format = FORMATS[spec.image_format][0]
+    size = (spec.width, spec.height)
+    with storage.open(spec.image_name) as source:
+        image = Image.open(source)
+        if image.format == 'JPEG':
+            image.draft('RGB', size)
+        image = ImageOps.exif_transpose(image)
+        if spec.crop:
+            image = ImageOps.fit(image, size, Image.LANCZOS)
+        else:
+            image.thumbnail(size, Image.LANCZOS)
+    if image_format == 'JPEG':
+        image = flatten(image)
+    options = {'optimize': True}
+    if image_format != 'PNG':
+        options['quality'] = settings.TRANSFORM_QUALITY
+    image.save(target, image_format, **options)
+
+
+def _write(spec, path):
+    """Строит файл преобразования; False, если исходник не читается."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    descriptor, temporary = tempfile.mkstemp(
+        dir=os.path.dirname(path), suffix='.part')
+    try:
+        with os.fdopen(descriptor, 'wb') as target:
+            with metrics.timed('thumb'):
+                _render(spec, target)
+        os.replace(temporary, path)
+    except (OSError, UnidentifiedImageError):
+        logger.warning('Не удалось преобразовать %s', spec.image_name)
+        return False
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+    metrics.count('thumb')
+    return True
+
+
+def _wait(path):
+    deadline = time.monotonic() + settings.CACHE_LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(settings.CACHE_LOCK_POLL)
+        if os.path.exists(path):
+            return True
+    return False
+
+
+def _cache_files(directory):
+    """Тройки (время доступа, размер, путь) файлов кеша."""
+    for root, _, names in os.walk(directory):
+        for name in names:
+            if name.endswith('.part'):
+                # Файл ещё пишется другим запросом
+                continue
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            yield stat.st_atime, stat.st_size, path
+
+
+def evict(directory=None, max_bytes=None):
+    """Удаляет давно не запрашивавшиеся файлы, пока кеш больше предела.
+
+    Обходит весь каталог, поэтому вызывается, только когда счётчик
+    размера превысил предел; заодно счётчик получает точное значение.
+    """
+    if max_bytes is None:
+        max_bytes = settings.TRANSFORM_CACHE_MAX_BYTES
+    files = sorted(_cache_files(directory or settings.TRANSFORM_CACHE_DIR))
+    total = sum(size for _, size, _ in files)
+    if total > max_bytes:
+        for _, size, path in files:
+            if total <= max_bytes * EVICT_TO:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+    if directory is None:
+        cache.set(SIZE_KEY, total, None)
+
+
+def _cache_size(added):
+    """Размер кеша после добавления added байтов."""
+    try:
+        return cache.incr(SIZE_KEY, added)
+    except ValueError:
+        # Счётчик пропал вместе с общим кешем: размер считается обходом.
+        # Удаления через purge счётчик не уменьшают, поэтому он может
+        # лишь завышать размер, и лишний обход его поправит.
+        total = sum(
+            file_size for _, file_size, _
+            in _cache_files(settings.TRANSFORM_CACHE_DIR))
+        cache.set(SIZE_KEY, total, None)
+        return total
+
+
+def _added(path):
+    """Учитывает новый файл в размере кеша и вытесняет лишнее."""
+    try:
+        size = os.path.getsize(path)
+    except FileNotFoundError:
+        return
+    if _cache_size(size) > settings.TRANSFORM_CACHE_MAX_BYTES:
+        evict()
+
+
+def get_or_render(spec):
+    """Путь к файлу преобразования; None, если исходник не читается."""
+    name = cache_name(spec)
+    path = os.path.join(settings.TRANSFORM_CACHE_DIR, name)
+    if _touch(path):
+        return path
+    key = f'transform:{name}'
+    if acquire_lock(key):
+        try:
+            if not os.path.exists(path):
+                if not _write(spec, path):
+                    return None
+                _added(path)
+        finally:
+            release_lock(key)
+        return path
+    if _wait(path):
+        return path
+    if _write(spec, path):
+        _added(path)
+        return path
+    return None
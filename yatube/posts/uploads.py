@@ -0,0 +1,118 @@
+"""Обработка картинок постов при загрузке.
+
+Оригиналы с камер весят десятки мегабайт, а показываются не крупнее
+нескольких сотен пикселей. Загруженная картинка поворачивается по EXIF,
+уменьшается до IMAGE_UPLOAD_MAX_SIZE и пересохраняется без метаданных:
+фотографии — в JPEG с качеством IMAGE_UPLOAD_QUALITY, PNG — в PNG.
+JPEG декодируется сразу в уменьшенном масштабе (draft), поэтому память
+не зависит от разрешения исходника, а картинки больше
+IMAGE_UPLOAD_MAX_PIXELS отклоняются, не будучи декодированы.
+GIF в пределах IMAGE_UPLOAD_MAX_SIZE сохраняются как есть, чтобы
+не потерять анимацию; статичный GIF крупнее уменьшается и сохраняется
+в PNG, а анимированный отклоняется.
+"""
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image, ImageOps
+
+CONTENT_TYPES = {'JPEG': 'image/jpeg', 'PNG': 'image/png'}
+EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png'}
+
+
+def _open(upload):
+    upload.seek(0)
+    image = Image.open(upload)
+    width, height = image.size
+    if width * height > settings.IMAGE_UPLOAD_MAX_PIXELS:
+        raise ValidationError(
+            'Слишком большое разрешение картинки: %(width)s×%(height)s.',
+            code='image_too_large',
+            params={'width': width, 'height': height},
+        )
+    return image
+
+
+def _target_format(image):
+    return 'PNG' if image.format in ('PNG', 'GIF') else 'JPEG'
+
+
+def _fits(image):
+    max_width, max_height = settings.IMAGE_UPLOAD_MAX_SIZE
+    width, height = image.size
+    return width <= max_width and height <= max_height
+
+
+def flatten(image, background=(255, 255, 255)):
+    """Картинка в RGB; прозрачные места заливаются цветом background.
+
+    Простой convert('RGB') отбрасывает альфа-канал, и прозрачный фон
+    становится чёрным или цветом скрытых пикселей.
+    """
+    if image.mode in ('RGBA', 'LA', 'PA') or (
+            image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        flat = Image.new('RGB', image.size, background)
+        flat.paste(image, mask=image.getchannel('A'))
+        return flat
+    return image if image.mode == 'RGB' else image.convert('RGB')
+
+
+def _prepare(image, target_format):
+    """Декодированная, повёрнутая и уменьшенная копия картинки."""
+    max_size = settings.IMAGE_UPLOAD_MAX_SIZE
+    if image.format == 'JPEG':
+        # Декодирование сразу в масштабе 1/2–1/8, не меньше нужного
+        image.draft('RGB', max_size)
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail(max_size, Image.LANCZOS)
+    if target_format == 'JPEG':
+        image = flatten(image)
+    return image
+
+
+def _encode(image, target_format, icc_profile):
+    buffer = BytesIO()
+    options = {'optimize': True}
+    if target_format == 'JPEG':
+        options.update(
+            quality=settings.IMAGE_UPLOAD_QUALITY, progressive=True)
+    if icc_profile:
+        # Цветовой профиль — единственные метаданные, которые сохраняются
+        options['icc_profile'] = icc_profile
+    image.save(buffer, target_format, **options)
+    return buffer.getvalue()
+
+
+def normalize_image(upload):
+    """Обработанная копия загруженной картинки.
+
+    Возвращает файл для поля image; его размеры — в атрибутах width
+    и height.
+    """
+    image = _open(upload)
+    if image.format == 'GIF' and _fits(image):
+        upload.seek(0)
+        upload.width, upload.height = image.size
+        return upload
+    if getattr(image, 'is_animated', False):
+        max_width, max_height = settings.IMAGE_UPLOAD_MAX_SIZE
+        raise ValidationError(
+            'Анимация должна быть не больше %(width)s×%(height)s.',
+            code='animation_too_large',
+            params={'width': max_width, 'height': max_height},
+        )
+    target_format = _target_format(image)
+    icc_profile = image.info.get('icc_profile')
+    image = _prepare(image, target_format)
+    stem = os.path.splitext(os.path.basename(upload.name))[0]
+    normalized = SimpleUploadedFile(
+        stem + EXTENSIONS[target_format],
+        _encode(image, target_format, icc_profile),
+        CONTENT_TYPES[target_format],
+    )
+    normalized.width, normalized.height = image.size
+    return normalized
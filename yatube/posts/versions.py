@@ -0,0 +1,78 @@
+"""Области кеша постов для счётчиков поколений из core.caching."""
+from core.caching import bump_generation, get_generations
+
+from .models import Group, Post
+
+ALL_POSTS = 'posts'
+GROUPS = 'groups'
+
+
+def group_scope(slug):
+    return f'group:{slug}'
+
+
+def author_scope(username):
+    return f'author:{username}'
+
+
+def post_scope(pk):
+    return f'post:{pk}'
+
+
+def bump_post(post, group_ids=()):
+    """Сбрасывает кеш страниц, на которых виден пост."""
+    slugs = Group.objects.filter(
+        pk__in=[pk for pk in group_ids if pk is not None]
+    ).values_list('slug', flat=True)
+    bump_generation(
+        ALL_POSTS,
+        post_scope(post.pk),
+        author_scope(post.author.username),
+        *(group_scope(slug) for slug in slugs),
+    )
+
+
+def attach_card_versions(posts):
+    """Проставляет постам card_version для кеша их карточек.
+
+    Версия карточки складывается из поколений поста, его автора
+    и группы: карточка показывает имя автора и ссылку на группу.
+    """
+    posts = list(posts)
+    scopes = [
+        [post_scope(post.pk), author_scope(post.author.username)]
+        + ([group_scope(post.group.slug)] if post.group else [])
+        for post in posts
+    ]
+    generations = iter(get_generations(
+        scope for post_scopes in scopes for scope in post_scopes))
+    for post, post_scopes in zip(posts, scopes):
+        post.card_version = '.'.join(
+            str(next(generations)) for _ in post_scopes)
+
+
+def index_scopes(request):
+    return [ALL_POSTS]
+
+
+def group_scopes(request, slug):
+    return [group_scope(slug)]
+
+
+def profile_scopes(request, username):
+    return [author_scope(username)]
+
+
+def post_detail_scopes(request, post_id):
+    username = Post.objects.values_list(
+        'author__username', flat=True).get(pk=post_id)
+    return [post_scope(post_id), author_scope(username)]
+
+
+def follow_scopes(request):
+    # Подписки читателя меняют поколение его области автора
+    return [ALL_POSTS, author_scope(request.user.username)]
+
+
+def post_comments_scopes(request, post_id):
+    return [post_scope(post_id)]
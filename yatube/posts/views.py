@@ -1,65 +1,165 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.core import signing
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404, redirect
-from django.views.decorators.cache import cache_page
 from django.urls import reverse
-from django.conf import settings
+from django.views.decorators.http import require_safe
 
+from core.caching import cache_view, conditional_view
+from core.media import file_response
+from core.query_budget import query_budget
+
+from . import thumbnails, transforms, versions
+from .exporter import CONTENT_TYPES, export_lines, export_records
 from .forms import PostForm, CommentForm
 from .models import Post, Group, User, Follow
-from .paginators import paginator
+from .paginators import CursorPaginator, FeedPaginator, paginator
+from .search import search_posts
+from .timeline import FollowFeed
 
 
-@cache_page(settings.CACHING_TIME, key_prefix='index_page')
+@query_budget(6)
+@conditional_view(versions.index_scopes)
+@cache_view(versions.index_scopes, key_prefix='index_page')
 def index(request):
     posts = Post.objects.select_related('group', 'author')
+    page_obj = paginator(posts, request, feed=('index',))
+    versions.attach_card_versions(page_obj)
+    thumbnails.attach_thumbnails(page_obj)
     context = {
         'title': 'Последние обновления на сайте',
-        'page_obj': paginator(posts, request),
+        'page_obj': page_obj,
     }
     return render(request, 'posts/index.html', context)
 
 
+@query_budget(6)
+@conditional_view(versions.group_scopes)
+@cache_view(versions.group_scopes, key_prefix='group_page')
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
     posts = group.posts.select_related('author')
+    page_obj = paginator(posts, request, feed=('group', group.pk))
+    versions.attach_card_versions(page_obj)
+    thumbnails.attach_thumbnails(page_obj)
     title = f'Записи сообщества {group.title}'
     context = {
         'title': title,
         'group': group,
-        'page_obj': paginator(posts, request),
+        'page_obj': page_obj,
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@query_budget(7)
+@conditional_view(versions.profile_scopes)
+@cache_view(versions.profile_scopes, key_prefix='profile_page')
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('counters'), username=username)
     posts = author.posts.select_related('group', 'author')
     following = (
         request.user.is_authenticated
         and Follow.objects.filter(user=request.user, author=author).exists()
     )
+    page_obj = paginator(posts, request, feed=('profile', author.pk))
+    versions.attach_card_versions(page_obj)
+    thumbnails.attach_thumbnails(page_obj)
     context = {
         'author': author,
-        'page_obj': paginator(posts, request),
+        'page_obj': page_obj,
         'following': following,
     }
     return render(request, 'posts/profile.html', context)
 
 
+@query_budget(7)
+@conditional_view(versions.post_detail_scopes)
+@cache_view(versions.post_detail_scopes, key_prefix='post_page')
 def post_detail(request, post_id):
     post = get_object_or_404(
-        Post.objects.select_related('group', 'author'), id=post_id)
+        Post.objects.select_related('group', 'author__counters'),
+        id=post_id,
+    )
     form = CommentForm(request.POST or None,)
-    comments = post.comments.select_related('author')
     context = {
         'post': post,
         'is_edit': post.author == request.user,
         'form': form,
-        'comments': comments
+        'comments': comments_page(post),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def comments_page(post, after=None):
+    """Страница комментариев поста, от новых к старым."""
+    return CursorPaginator(
+        post.comments.select_related('author'),
+        settings.COMMENTS_ON_PAGE,
+        ordering=('-created', '-pk'),
+    ).get_page(after=after)
+
+
+@query_budget(5)
+@conditional_view(versions.post_comments_scopes)
+@cache_view(versions.post_comments_scopes, key_prefix='comments_page')
+def post_comments(request, post_id):
+    """Следующая страница комментариев для подгрузки на странице поста."""
+    post = get_object_or_404(Post, id=post_id)
+    context = {
+        'post': post,
+        'comments': comments_page(post, request.GET.get('after')),
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
+@query_budget(5)
+@conditional_view(versions.index_scopes)
+@cache_view(versions.index_scopes, key_prefix='search_page')
+def search(request):
+    query = request.GET.get('q', '').strip()
+    posts = search_posts(Post.objects.select_related('group', 'author'), query)
+    page_obj = paginator(posts, request, cursor=True, ordering=('rank', '-pk'))
+    versions.attach_card_versions(page_obj)
+    thumbnails.attach_thumbnails(page_obj)
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/search.html', context)
+
+
+def export_response(request, posts, filename):
+    """Отдаёт посты файлом JSONL или CSV (?format=csv) по мере чтения."""
+    file_format = request.GET.get('format')
+    if file_format not in CONTENT_TYPES:
+        file_format = 'jsonl'
+    records = export_records(posts, request.build_absolute_uri)
+    response = StreamingHttpResponse(
+        export_lines(records, file_format),
+        content_type=CONTENT_TYPES[file_format],
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{filename}.{file_format}"')
+    return response
+
+
+@query_budget(5)
+@login_required
+def profile_export(request, username):
+    author = get_object_or_404(User, username=username)
+    return export_response(request, author.posts.all(), f'posts-{username}')
+
+
+@query_budget(5)
+@login_required
+def group_export(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return export_response(request, group.posts.all(), f'group-{slug}')
+
+
+@query_budget(20)
 @login_required
 def post_create(request):
     form = PostForm(
@@ -74,6 +174,7 @@ def post_create(request):
     return redirect("posts:profile", request.user)
 
 
+@query_budget(20)
 @login_required
 def post_edit(request, post_id):
     post = get_object_or_404(Post, id=post_id)
@@ -95,6 +196,7 @@ def post_edit(request, post_id):
     return render(request, 'posts/create_post.html', context)
 
 
+@query_budget(12)
 @login_required
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
@@ -107,15 +209,22 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@query_budget(7)
 @login_required
+@conditional_view(versions.follow_scopes)
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
+    page_obj = FeedPaginator(
+        FollowFeed(request.user.pk), settings.POSTS_ON_PAGE
+    ).get_page(request.GET.get('page'))
+    versions.attach_card_versions(page_obj)
+    thumbnails.attach_thumbnails(page_obj)
     context = {
-        'page_obj': paginator(posts, request),
+        'page_obj': page_obj,
     }
     return render(request, 'posts/follow.html', context)
 
 
+@query_budget(15)
 @login_required
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
@@ -124,8 +233,27 @@ def profile_follow(request, username):
     return redirect(reverse('posts:profile', kwargs={'username': username}))
 
 
+@query_budget(15)
 @login_required
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     Follow.objects.filter(user=request.user, author=author).delete()
     return redirect(reverse('posts:profile', kwargs={'username': username}))
+
+
+# Запросы к базе делает только страница 404 с сессией и пользователем
+@query_budget(2)
+@require_safe
+def image_transform(request, token):
+    """Картинка поста в размере и формате из подписанного токена."""
+    try:
+        spec = transforms.load(token)
+    except signing.BadSignature:
+        raise Http404
+    path = transforms.get_or_render(spec)
+    if path is None:
+        raise Http404
+    return file_response(
+        request, path, transforms.cache_name(spec),
+        settings.TRANSFORM_ACCEL_PREFIX,
+    )
@@ -50,6 +50,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Замеры и бюджеты — первыми, чтобы учесть запросы сессии
+    # и пользователя; бюджеты проверяются только при отладке
+    'core.middleware.ServerTimingMiddleware',
+    'core.middleware.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -59,16 +63,65 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Бюджеты SQL-запросов: по умолчанию и по именам адресов для представлений
+# без декоратора query_budget; при превышении 'log' или 'raise'
+QUERY_BUDGET_DEFAULT = 10
+QUERY_BUDGETS = {}
+QUERY_BUDGET_MODE = 'log'
+
+# Замеры запросов: заголовок Server-Timing и строка JSON в журнале
+# core.metrics (уровень INFO) на каждый запрос. Заголовок раскрывает
+# внутренние тайминги любому клиенту, поэтому отдаётся только при отладке
+SERVER_TIMING = DEBUG
+SERVER_TIMING_LOG = True
+
+# Без своего обработчика записи INFO журнала core.metrics отбрасывались бы:
+# по умолчанию Django выводит только предупреждения и ошибки.
+# METRICS_LOG_LEVEL=WARNING убирает строки замеров из вывода, например
+# при прогоне тестов
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'metrics': {'format': '%(asctime)s %(name)s %(message)s'},
+    },
+    'handlers': {
+        'metrics': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'metrics',
+        },
+    },
+    'loggers': {
+        'core.metrics': {
+            'handlers': ['metrics'],
+            'level': os.environ.get('METRICS_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
 ROOT_URLCONF = 'yatube.urls'
 
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+# Шаблоны компилируются один раз на процесс и берутся из памяти.
+# TEMPLATE_RELOAD=1 в окружении отключает это при правке шаблонов,
+# чтобы изменения были видны без перезапуска сервера
+TEMPLATE_RELOAD = os.environ.get('TEMPLATE_RELOAD') == '1'
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if not TEMPLATE_RELOAD:
+    TEMPLATE_LOADERS = [
+        ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+    ]
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backends.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -133,6 +186,13 @@ USE_TZ = True
 STATIC_URL = '/static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Передача загруженных файлов фронтенду: 'x-accel-redirect' (nginx,
+# internal location MEDIA_ACCEL_PREFIX с alias на MEDIA_ROOT),
+# 'x-sendfile' (Apache, lighttpd) или None — файлы отдаёт Django
+MEDIA_ACCEL = os.environ.get('MEDIA_ACCEL') or None
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+# Имена загруженных файлов не переиспользуются, их можно кешировать на год
+MEDIA_CACHE_MAX_AGE = 365 * 24 * 60 * 60
 
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
@@ -143,16 +203,125 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 # Ограничение количества выводимых постов
 POSTS_ON_PAGE = 10
+# Комментариев на странице поста и в одной подгрузке
+COMMENTS_ON_PAGE = 20
+
+# Курсорная паджинация лент (?after=/?before=) вместо номеров страниц
+CURSOR_PAGINATION = False
 
 # Ограничение длины строкти представляющей объект класса
 STRING_LENGTH = 15
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+# Кеш задаётся переменной окружения CACHE_URL:
+#   redis://host:6379/0 — общий сетевой кеш с пулом соединений;
+#   sqlite:////var/cache/yatube.sqlite3 — файл, общий для всех процессов
+#   машины. По умолчанию кеш SQLite живёт в памяти процесса (тесты,
+#   разработка). CACHE_VERSION меняют, чтобы разом сбросить весь кеш.
+CACHE_URL = os.environ.get('CACHE_URL', '')
+if CACHE_URL.startswith(('redis://', 'rediss://', 'unix://')):
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache_backends.RedisCache',
+            'LOCATION': CACHE_URL,
+            'OPTIONS': {
+                'max_connections': int(
+                    os.environ.get('CACHE_MAX_CONNECTIONS', 50)),
+                'socket_timeout': 1,
+            },
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache_backends.SQLiteCache',
+            'LOCATION': (
+                CACHE_URL[len('sqlite://'):]
+                if CACHE_URL.startswith('sqlite://') else ':memory:'
+            ),
+            'OPTIONS': {
+                'MAX_ENTRIES': 100000,
+            },
+        }
     }
+CACHES['default'].update(
+    KEY_PREFIX='yatube',
+    VERSION=int(os.environ.get('CACHE_VERSION', 1)),
+)
+
+# Сколько секунд держится блокировка пересчёта горячего ключа
+# и как часто ожидающие запросы проверяют готовность значения
+CACHE_LOCK_TIMEOUT = 10
+CACHE_LOCK_POLL = 0.05
+
+# Сколько секунд после срока устаревшая страница ещё отдаётся, пока
+# её пересчитывает один запрос, и коэффициент раннего пересчёта
+# (0 — пересчёт строго по сроку)
+CACHE_STALE_TIME = 60 * 10
+CACHE_EARLY_EXPIRY_BETA = 1.0
+
+# Время жизни закешированных страниц, секунды. Страницы сбрасываются
+# счётчиками поколений при изменении данных, поэтому срок может быть долгим
+CACHING_TIME = 60 * 60 * 24
+
+# Время жизни кешированного размера ленты, секунды
+FEED_COUNT_TIMEOUT = 60 * 5
+
+# С какого числа строк общий размер ленты берётся из статистики СУБД
+APPROXIMATE_COUNT_THRESHOLD = 100000
+
+# Размер пачки записей при раскладке поста по лентам подписчиков
+TIMELINE_BATCH_SIZE = 1000
+
+# Посты авторов с большим числом подписчиков не раскладываются по лентам,
+# а подмешиваются при чтении из кеша их последних постов
+FANOUT_FOLLOWERS_LIMIT = 10000
+RECENT_POSTS_SIZE = 200
+RECENT_POSTS_TIMEOUT = 60 * 60
+# Раскладка постов автора, переставшего быть популярным, идёт в фоновом
+# потоке, а не в запросе отписки
+TIMELINE_ASYNC = True
+
+# Миниатюры картинок постов: имя -> (геометрия, параметры sorl-thumbnail).
+# Строятся в фоне после сохранения поста пулом из THUMBNAIL_WORKERS потоков
+POST_THUMBNAILS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
 }
-
-CACHING_TIME = 20
+# Каждая миниатюра строится также в меньших ширинах для srcset и во всех
+# форматах списка, которые поддерживает Pillow; запасной <img> — в JPEG
+POST_RENDITION_WIDTHS = (320, 640)
+POST_RENDITION_FORMATS = ('WEBP', 'JPEG')
+THUMBNAIL_ASYNC = True
+THUMBNAIL_WORKERS = 2
+# Сколько секунд помнится неудача построения миниатюры, прежде чем
+# её попробуют построить снова
+THUMBNAIL_FAILURE_TIMEOUT = 60 * 5
+
+# Обработка картинок при загрузке: наибольшие ширина и высота, качество
+# JPEG и предельное число пикселей исходника (защита от «бомб»)
+IMAGE_UPLOAD_MAX_SIZE = (2048, 2048)
+IMAGE_UPLOAD_QUALITY = 85
+IMAGE_UPLOAD_MAX_PIXELS = 50_000_000
+# Через сколько секунд файл картинки без ссылок (после отката транзакции)
+# удаляет команда purge_orphan_images
+ORPHAN_IMAGE_AGE = 24 * 60 * 60
+
+# Преобразования картинок по подписанным адресам (posts:image_transform):
+# каталог и предельный размер дискового кеша, наибольшая сторона,
+# качество и internal location nginx для X-Accel-Redirect
+TRANSFORM_CACHE_DIR = os.path.join(BASE_DIR, 'transform_cache')
+TRANSFORM_CACHE_MAX_BYTES = 512 * 1024 * 1024
+TRANSFORM_MAX_SIZE = 2048
+TRANSFORM_QUALITY = 85
+TRANSFORM_ACCEL_PREFIX = '/protected-transforms/'
+# Окно срока действия адреса преобразования, секунды: адрес действует
+# от одного до двух окон и не меняется в пределах окна; должно перекрывать
+# время жизни закешированных страниц, в которые адрес вставлен
+TRANSFORM_URL_MAX_AGE = 30 * 24 * 60 * 60
+
+# Импорт контента: размер пачки bulk_create и записей в одной транзакции
+IMPORT_BATCH_SIZE = 1000
+IMPORT_CHUNK_SIZE = 10000
+# Выгрузка постов читает базу частями по EXPORT_CHUNK_SIZE строк
+EXPORT_CHUNK_SIZE = 2000